@@ -0,0 +1,77 @@
+from logging.config import fileConfig
+
+from alembic import context
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, pool
+
+from app.core.config import settings
+from app.db.session import Base
+from app.services.search_service import FTS_TABLE
+import app.models  # noqa: F401  (registers every model on Base.metadata)
+
+config = context.config
+
+# The app configures its own logging when it runs migrations at startup
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Schema that Base.metadata.create_all() produced before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def include_name(name, type_, parent_names) -> bool:
+    # Search structures are managed by SearchService, not by the models
+    if type_ == "table" and name.startswith(FTS_TABLE):
+        return False
+    if type_ == "index" and name == "ix_products_search":
+        return False
+    return True
+
+
+def _adopt_legacy_schema(connection) -> None:
+    """Stamp databases created by create_all() so upgrades start after the baseline."""
+    inspector = inspect(connection)
+    if not inspector.has_table("alembic_version") and inspector.has_table("users"):
+        script = ScriptDirectory.from_config(config)
+        MigrationContext.configure(connection).stamp(script, BASELINE_REVISION)
+    # End the inspection transaction so run_migrations() manages its own
+    connection.commit()
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=settings.get_database_url(),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(settings.get_database_url(), poolclass=pool.NullPool)
+
+    with connectable.connect() as connection:
+        _adopt_legacy_schema(connection)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            # SQLite can't ALTER most things in place
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,190 @@
+"""initial schema
+
+Tables as created by Base.metadata.create_all() before migrations were
+introduced. Existing databases without an alembic_version table are
+stamped at this revision by env.py.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('full_name', sa.String(), nullable=True),
+    sa.Column('google_id', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_superuser', sa.Boolean(), nullable=True),
+    sa.Column('is_vendor', sa.Boolean(), nullable=True),
+    sa.Column('rating', sa.Float(), nullable=True),
+    sa.Column('rating_count', sa.Integer(), nullable=True),
+    sa.Column('fcm_token', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_full_name', 'users', ['full_name'], unique=False)
+    op.create_index('ix_users_google_id', 'users', ['google_id'], unique=True)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+
+    op.create_table('crypto_wallets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('wallet_address', sa.String(length=100), nullable=False),
+    sa.Column('wallet_type', sa.String(length=50), nullable=True),
+    sa.Column('network', sa.String(length=50), nullable=True),
+    sa.Column('is_primary', sa.Boolean(), nullable=True),
+    sa.Column('is_verified', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_crypto_wallets_id', 'crypto_wallets', ['id'], unique=False)
+    op.create_index('ix_crypto_wallets_user_id', 'crypto_wallets', ['user_id'], unique=False)
+    op.create_index('ix_crypto_wallets_wallet_address', 'crypto_wallets', ['wallet_address'], unique=False)
+
+    op.create_table('products',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('images', sa.JSON(), nullable=True),
+    sa.Column('category', sa.String(), nullable=True),
+    sa.Column('seller_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_products_category', 'products', ['category'], unique=False)
+    op.create_index('ix_products_id', 'products', ['id'], unique=False)
+    op.create_index('ix_products_title', 'products', ['title'], unique=False)
+
+    op.create_table('favorites',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'product_id', name='unique_user_product_favorite')
+    )
+    op.create_index('ix_favorites_id', 'favorites', ['id'], unique=False)
+
+    op.create_table('orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('buyer_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('total_price', sa.Float(), nullable=False),
+    sa.Column('payment_method', sa.Enum('TON', 'LUMICASH', name='paymentmethod'), nullable=False),
+    sa.Column('status', sa.Enum('CREATED', 'PAID_ESCROW', 'SHIPPED', 'DELIVERED', 'COMPLETED', 'CANCELLED', 'DISPUTED', name='orderstatus'), nullable=False),
+    sa.Column('transaction_hash', sa.String(), nullable=True),
+    sa.Column('escrow_address', sa.String(), nullable=True),
+    sa.Column('wallet_used', sa.Enum('TONKEEPER', 'SAFEPAL', 'MYTONWALLET', 'OTHER', name='wallettype'), nullable=True),
+    sa.Column('shipping_address', sa.String(), nullable=True),
+    sa.Column('tracking_number', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('paid_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('shipped_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['buyer_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_orders_id', 'orders', ['id'], unique=False)
+
+    op.create_table('crypto_transactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('from_address', sa.String(length=100), nullable=False),
+    sa.Column('to_address', sa.String(length=100), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('currency', sa.String(length=20), nullable=False),
+    sa.Column('network', sa.String(length=50), nullable=True),
+    sa.Column('tx_hash', sa.String(length=100), nullable=True),
+    sa.Column('block_number', sa.Integer(), nullable=True),
+    sa.Column('confirmations', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('confirmed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_crypto_transactions_id', 'crypto_transactions', ['id'], unique=False)
+    op.create_index('ix_crypto_transactions_order_id', 'crypto_transactions', ['order_id'], unique=False)
+    op.create_index('ix_crypto_transactions_tx_hash', 'crypto_transactions', ['tx_hash'], unique=True)
+
+    op.create_table('messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sender_id', sa.Integer(), nullable=False),
+    sa.Column('receiver_id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('content', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('is_read', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['receiver_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['sender_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_messages_id', 'messages', ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_id', table_name='messages')
+
+    op.drop_table('messages')
+    op.drop_index('ix_crypto_transactions_tx_hash', table_name='crypto_transactions')
+    op.drop_index('ix_crypto_transactions_order_id', table_name='crypto_transactions')
+    op.drop_index('ix_crypto_transactions_id', table_name='crypto_transactions')
+
+    op.drop_table('crypto_transactions')
+    op.drop_index('ix_orders_id', table_name='orders')
+
+    op.drop_table('orders')
+    op.drop_index('ix_favorites_id', table_name='favorites')
+
+    op.drop_table('favorites')
+    op.drop_index('ix_products_title', table_name='products')
+    op.drop_index('ix_products_id', table_name='products')
+    op.drop_index('ix_products_category', table_name='products')
+
+    op.drop_table('products')
+    op.drop_index('ix_crypto_wallets_wallet_address', table_name='crypto_wallets')
+    op.drop_index('ix_crypto_wallets_user_id', table_name='crypto_wallets')
+    op.drop_index('ix_crypto_wallets_id', table_name='crypto_wallets')
+
+    op.drop_table('crypto_wallets')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_users_google_id', table_name='users')
+    op.drop_index('ix_users_full_name', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+
+    op.drop_table('users')
+    for enum_name in ('orderstatus', 'paymentmethod', 'wallettype'):
+        sa.Enum(name=enum_name).drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,70 @@
+"""listing indexes and product search
+
+Composite indexes backing the keyset-paginated listings (products, orders by
+buyer/seller, messages by order/participant, crypto transactions, favorites by
+user) and the product full-text search structures.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_products_created_at_id', 'products', ['created_at', 'id']),
+    ('ix_products_price_id', 'products', ['price', 'id']),
+    ('ix_orders_buyer_created_at_id', 'orders', ['buyer_id', 'created_at', 'id']),
+    ('ix_orders_seller_created_at_id', 'orders', ['seller_id', 'created_at', 'id']),
+    ('ix_messages_order_created_at_id', 'messages', ['order_id', 'created_at', 'id']),
+    ('ix_messages_sender_created_at_id', 'messages', ['sender_id', 'created_at', 'id']),
+    ('ix_messages_receiver_created_at_id', 'messages', ['receiver_id', 'created_at', 'id']),
+    ('ix_crypto_transactions_created_at_id', 'crypto_transactions', ['created_at', 'id']),
+    ('ix_favorites_user_created_at_id', 'favorites', ['user_id', 'created_at', 'id']),
+)
+
+# Snapshot of the search structures at this revision (app.services.search_service):
+# Postgres queries must use the very same expression to hit the GIN index
+FTS_TABLE = 'products_fts'
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(products.title, '') || ' ' || "
+    "coalesce(products.description, ''))"
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(sa.text(
+            f'CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN ({PG_DOCUMENT})'
+        ))
+    elif bind.dialect.name == 'sqlite':
+        op.execute(sa.text(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, description)'
+        ))
+        op.execute(sa.text(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+            f"SELECT id, title, coalesce(description, '') FROM products "
+            f"WHERE id NOT IN (SELECT rowid FROM {FTS_TABLE})"
+        ))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_products_search', table_name='products', if_exists=True)
+    elif bind.dialect.name == 'sqlite':
+        op.execute(sa.text(f'DROP TABLE IF EXISTS {FTS_TABLE}'))
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
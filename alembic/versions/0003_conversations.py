@@ -0,0 +1,86 @@
+"""conversation summaries
+
+One row per chat thread (participant pair + order) with the last message and
+per-participant unread counters, backfilled from the existing messages.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conversations = op.create_table('conversations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_a_id', sa.Integer(), nullable=False),
+    sa.Column('user_b_id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('order_key', sa.Integer(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=True),
+    sa.Column('last_message_content', sa.String(), nullable=True),
+    sa.Column('last_sender_id', sa.Integer(), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=False),
+    sa.Column('unread_a', sa.Integer(), nullable=False),
+    sa.Column('unread_b', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ),
+    sa.ForeignKeyConstraint(['last_sender_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['user_a_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_b_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_a_id', 'user_b_id', 'order_key', name='unique_conversation_thread')
+    )
+    op.create_index('ix_conversations_id', 'conversations', ['id'], unique=False)
+    op.create_index('ix_conversations_user_a_last_message_at_id', 'conversations', ['user_a_id', 'last_message_at', 'id'], unique=False)
+    op.create_index('ix_conversations_user_b_last_message_at_id', 'conversations', ['user_b_id', 'last_message_at', 'id'], unique=False)
+
+    # Backfill: one grouped pass over messages, then copy the last message of each thread
+    messages = sa.table('messages',
+        sa.column('id', sa.Integer), sa.column('sender_id', sa.Integer), sa.column('receiver_id', sa.Integer),
+        sa.column('order_id', sa.Integer), sa.column('content', sa.String),
+        sa.column('created_at', sa.DateTime), sa.column('is_read', sa.Boolean),
+    )
+    user_a = sa.case((messages.c.sender_id < messages.c.receiver_id, messages.c.sender_id), else_=messages.c.receiver_id)
+    user_b = sa.case((messages.c.sender_id < messages.c.receiver_id, messages.c.receiver_id), else_=messages.c.sender_id)
+    order_key = sa.func.coalesce(messages.c.order_id, sa.literal_column("0"))  # no bind param: must match the GROUP BY on PostgreSQL
+    unread = sa.func.coalesce(messages.c.is_read, sa.false()) == sa.false()
+
+    def unread_count(user):
+        return sa.func.coalesce(sa.func.sum(sa.case((sa.and_(unread, messages.c.receiver_id == user), 1), else_=0)), 0)
+
+    grouped = sa.select(
+        user_a, user_b, sa.func.max(messages.c.order_id), order_key,
+        sa.func.max(messages.c.id), sa.func.coalesce(sa.func.max(messages.c.created_at), sa.func.current_timestamp()),
+        unread_count(user_a), unread_count(user_b),
+    ).group_by(user_a, user_b, order_key)
+    op.execute(conversations.insert().from_select(
+        ['user_a_id', 'user_b_id', 'order_id', 'order_key', 'last_message_id', 'last_message_at', 'unread_a', 'unread_b'],
+        grouped,
+    ))
+
+    def last(column):
+        return sa.select(column).where(messages.c.id == conversations.c.last_message_id).scalar_subquery()
+
+    op.execute(conversations.update().values(
+        last_message_content=sa.func.substr(last(messages.c.content), 1, 200),
+        last_sender_id=last(messages.c.sender_id),
+        last_message_at=sa.func.coalesce(last(messages.c.created_at), conversations.c.last_message_at),
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_user_b_last_message_at_id', table_name='conversations')
+    op.drop_index('ix_conversations_user_a_last_message_at_id', table_name='conversations')
+    op.drop_index('ix_conversations_id', table_name='conversations')
+    op.drop_table('conversations')
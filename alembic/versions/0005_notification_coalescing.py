@@ -0,0 +1,34 @@
+"""notification coalescing
+
+collapse_key / coalesced_count on notification_outbox: chat pushes for the
+same receiver and thread fold into one pending row.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.add_column(sa.Column('collapse_key', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('coalesced_count', sa.Integer(), server_default='1', nullable=False))
+        batch_op.create_unique_constraint('uq_notification_outbox_collapse_key', ['collapse_key'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('notification_outbox') as batch_op:
+        batch_op.drop_constraint('uq_notification_outbox_collapse_key', type_='unique')
+        batch_op.drop_column('coalesced_count')
+        batch_op.drop_column('collapse_key')
@@ -0,0 +1,27 @@
+"""crypto transaction status index
+
+Index on crypto_transactions (status, id) for the background confirmation
+poller, which pages through pending/confirming payments by id.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_crypto_transactions_status_id', 'crypto_transactions', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_crypto_transactions_status_id', table_name='crypto_transactions')
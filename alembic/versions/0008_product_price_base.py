@@ -0,0 +1,42 @@
+"""product price_base
+
+products.price_base: the price converted to the reference currency (USD),
+maintained by the application from the exchange rates. Price filters and
+sorts use it through (price_base, id) and (category, price_base, id), which
+replace the index on the raw price. Prices already in a USD-pegged currency
+are backfilled here; the others are filled on the first rate refresh.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('price_base', sa.Float(), nullable=True))
+    op.execute(
+        "UPDATE products SET price_base = price "
+        "WHERE upper(currency) IN ('USD', 'USDT', 'USDC', 'DAI', 'BUSD')"
+    )
+    op.create_index('ix_products_price_base_id', 'products', ['price_base', 'id'], unique=False)
+    op.create_index('ix_products_category_price_base_id', 'products', ['category', 'price_base', 'id'], unique=False)
+    op.drop_index('ix_products_price_id', table_name='products', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_products_price_id', 'products', ['price', 'id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_products_category_price_base_id', table_name='products')
+    op.drop_index('ix_products_price_base_id', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('price_base')
@@ -0,0 +1,32 @@
+"""product popularity
+
+products.popularity: time-decayed score of orders and favorites used by
+sort_by=popular, with an index on (popularity, id) for keyset paging. The
+application rebuilds the scores at startup and periodically.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('popularity', sa.Float(), server_default='0', nullable=False))
+    op.create_index('ix_products_popularity_id', 'products', ['popularity', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_popularity_id', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('popularity')
@@ -0,0 +1,41 @@
+"""product views
+
+products.view_count and product_view_daily (views per product and day),
+both written in batches by the application's view counter.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('view_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('product_view_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'day', name='uq_product_view_daily_product_day')
+    )
+    op.create_index('ix_product_view_daily_id', 'product_view_daily', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_view_daily_id', table_name='product_view_daily')
+    op.drop_table('product_view_daily')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('view_count')
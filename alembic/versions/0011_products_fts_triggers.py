@@ -0,0 +1,70 @@
+"""products_fts sync triggers
+
+SQLite only: triggers on products keep the FTS5 table products_fts in sync,
+whatever inserts or edits the product (API, seed scripts, admin shell), and
+products missing from it are indexed. Postgres searches an expression index,
+nothing to do.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FTS_TABLE = 'products_fts'
+
+TRIGGERS = {
+    'products_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description)
+            VALUES (new.id, new.title, coalesce(new.description, ''));
+        END""",
+    'products_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description ON products BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE}(rowid, title, description)
+            VALUES (new.id, new.title, coalesce(new.description, ''));
+        END""",
+    'products_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END""",
+}
+
+
+def _has_fts_table(bind) -> bool:
+    return bind.execute(
+        sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE},
+    ).first() is not None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not _has_fts_table(bind):
+        return
+    for ddl in TRIGGERS.values():
+        op.execute(sa.text(ddl))
+    # Products written outside the API before the triggers existed
+    op.execute(sa.text(
+        f"INSERT INTO {FTS_TABLE}(rowid, title, description) "
+        f"SELECT id, title, coalesce(description, '') FROM products "
+        f"WHERE id NOT IN (SELECT rowid FROM {FTS_TABLE})"
+    ))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for name in reversed(list(TRIGGERS)):
+        op.execute(sa.text(f'DROP TRIGGER IF EXISTS {name}'))
@@ -0,0 +1,29 @@
+"""crypto transaction start block
+
+Chain head when a payment is initialised: the transfer indexer only matches
+it to transfers mined after that block.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 22:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('crypto_transactions', sa.Column('start_block', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('crypto_transactions') as batch_op:
+        batch_op.drop_column('start_block')
@@ -0,0 +1,29 @@
+"""product currency upper case
+
+Currencies are stored upper case (the API normalizes them), so the
+price_base recompute of a currency is a plain equality on
+ix_products_currency.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 23:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE products SET currency = upper(trim(currency)) WHERE currency <> upper(trim(currency))")
+    op.create_index('ix_products_currency', 'products', ['currency'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_currency', table_name='products')
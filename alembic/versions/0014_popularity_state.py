@@ -0,0 +1,36 @@
+"""popularity state
+
+popularity_state: the epoch products.popularity is scaled to and the time
+of the last bulk rebuild, shared by all workers. Seeded with the epoch the
+existing scores use.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0014'
+down_revision: Union[str, None] = '0013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    state = op.create_table('popularity_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('epoch', sa.DateTime(), nullable=False),
+    sa.Column('rebuilt_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(state, [{'id': 1, 'epoch': datetime(2026, 1, 1), 'rebuilt_at': None}])
+
+
+def downgrade() -> None:
+    op.drop_table('popularity_state')
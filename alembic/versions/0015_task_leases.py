@@ -0,0 +1,37 @@
+"""task leases
+
+task_leases: which worker currently runs a background task that must run
+in one worker at a time (the payment confirmation poller).
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18 01:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0015'
+down_revision: Union[str, None] = '0014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('task_leases',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('holder', sa.String(length=64), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_task_leases_id'), 'task_leases', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_task_leases_id'), table_name='task_leases')
+    op.drop_table('task_leases')
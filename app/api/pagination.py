@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A cursor is an opaque token holding the sort-key values of the last row of a page.
+The next page is fetched with `WHERE (sort keys) > cursor` instead of OFFSET, so page N
+costs the same as page 1 (given a matching composite index) and inserts don't shift pages.
+The cursor for the next page is returned in the `X-Next-Cursor` response header, which
+keeps the list response bodies unchanged for existing clients.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, Select, func, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    payload = {
+        "s": sort,
+        "v": [v.isoformat() if isinstance(v, datetime) else v for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload["s"] != sort or len(payload["v"]) != len(columns):
+            raise ValueError("cursor does not match this listing")
+        values = []
+        for column, value in zip(columns, payload["v"]):
+            if isinstance(column.type, DateTime) and value is not None:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _keyset_filter(dialect: str, columns: Sequence[Any], values: Sequence[Any], descending: bool):
+    left, right = [], []
+    for column, value in zip(columns, values):
+        if dialect == "sqlite" and isinstance(column.type, DateTime):
+            # SQLite stores datetimes as text with or without microseconds
+            # (server_default vs Python default), compare them numerically instead
+            left.append(func.julianday(column))
+            right.append(func.julianday(literal(value, column.type)))
+        else:
+            left.append(column)
+            right.append(literal(value, column.type))
+    if len(columns) == 1:
+        lhs, rhs = left[0], right[0]
+    else:
+        lhs, rhs = tuple_(*left), tuple_(*right)
+    return lhs < rhs if descending else lhs > rhs
+
+
+def _page_statement(stmt, dialect, columns, limit, cursor, skip, descending, sort):
+    stmt = stmt.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    if cursor:
+        values = decode_cursor(cursor, sort, columns)
+        stmt = stmt.filter(_keyset_filter(dialect, columns, values, descending))
+    elif skip:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit + 1)
+
+
+def _trim_page(rows: list, columns, limit, sort, response) -> list:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if response is not None:
+            last = rows[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                sort, [getattr(last, column.key) for column in columns]
+            )
+    return rows
+
+
+def paginate(
+    query: Query,
+    columns: Sequence[Any],
+    *,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = True,
+    sort: str = "default",
+    response: Optional[Response] = None,
+) -> list:
+    """
+    Order `query` by `columns` (the last one must be unique, usually the primary key)
+    and return one page of rows.
+
+    With a cursor, `skip` is ignored. When more rows are available, the cursor of
+    the next page is set on `response`.
+    """
+    dialect = query.session.get_bind().dialect.name
+    query = _page_statement(query, dialect, columns, limit, cursor, skip, descending, sort)
+    return _trim_page(query.all(), columns, limit, sort, response)
+
+
+async def paginate_async(
+    db: AsyncSession,
+    stmt: Select,
+    columns: Sequence[Any],
+    *,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = True,
+    sort: str = "default",
+    response: Optional[Response] = None,
+) -> list:
+    """`paginate` for a `select()` of ORM entities run on an AsyncSession."""
+    dialect = db.get_bind().dialect.name
+    stmt = _page_statement(stmt, dialect, columns, limit, cursor, skip, descending, sort)
+    rows = (await db.scalars(stmt)).all()
+    return _trim_page(list(rows), columns, limit, sort, response)
@@ -2,7 +2,8 @@ from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas, models
 from app.api import deps
@@ -12,9 +13,9 @@ from app.core.config import settings
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.User)
-def register(
+async def register(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_in: schemas.UserCreate,
 ) -> Any:
     """
@@ -22,7 +23,7 @@ def register(
     For buyers, Google Sign-In is recommended but not enforced here.
     """
     # Check if user already exists
-    user = db.query(models.User).filter(models.User.email == user_in.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == user_in.email))
     if user:
         raise HTTPException(
             status_code=400,
@@ -32,25 +33,30 @@ def register(
     # Create new user
     db_user = models.User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await security.password_hasher.hash(user_in.password),
         full_name=user_in.full_name,
         is_vendor=user_in.is_vendor
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login/access-token", response_model=schemas.Token)
-def login_access_token(
-    db: Session = Depends(deps.get_db),
+async def login_access_token(
+    db: AsyncSession = Depends(deps.get_async_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    user = await db.scalar(select(models.User).where(models.User.email == form_data.username))
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await security.password_hasher.verify_and_update(
+            form_data.password, user.hashed_password
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password",
@@ -58,6 +64,11 @@ def login_access_token(
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     
+    # Stored hash uses an outdated bcrypt cost: upgrade it transparently
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": security.create_access_token(
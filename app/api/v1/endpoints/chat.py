@@ -1,102 +1,149 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Dict
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
 from app.api import deps
+from app.api.pagination import paginate
 from app.models.user import User
 from app.models.message import Message
-from app.schemas.message import MessageCreate, MessageWithSender, MessageUpdate
-from datetime import datetime
+from app.models.conversation import Conversation
+from app.schemas.message import (
+    MessageCreate, MessageWithSender, MessageUpdate, ConversationSummary, UserPresence,
+    ReadWatermark, ReadReceipt,
+)
+from app.services.chat_service import ChatService
+from app.services.connection_manager import manager, read_frame, PONG_FRAME
+from app.services.message_writer import message_writer
 import json
 
 
 router = APIRouter()
 
-# Store active WebSocket connections
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, user_id: int):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-
-    def disconnect(self, user_id: int):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-
-    async def send_personal_message(self, message: str, user_id: int):
-        if user_id in self.active_connections:
-            await self.active_connections[user_id].send_text(message)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
-
-
-manager = ConnectionManager()
-
 
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     user_id: int,
-    db: Session = Depends(deps.get_db)
+    heartbeat: bool = Query(False, description="Receive application pings and answer them (idle sockets are closed)"),
+    receipts: bool = Query(False, description="Receive {\"type\": \"read\"} read receipt frames"),
 ):
-    await manager.connect(websocket, user_id)
+    connection = await manager.connect(websocket, user_id, heartbeats=heartbeat, receipts=receipts)
     try:
         while True:
             data = await websocket.receive_text()
+            connection.touch()
             message_data = json.loads(data)
             
-            # Create message in database
-            db_message = Message(
-                sender_id=user_id,
-                receiver_id=message_data["receiver_id"],
-                order_id=message_data.get("order_id"),
-                content=message_data["content"],
-                created_at=datetime.utcnow(),
-                is_read=False
-            )
-            db.add(db_message)
-            db.commit()
-            db.refresh(db_message)
+            # Heartbeat frames: a client that sends them opts in to application pings
+            frame_type = message_data.get("type")
+            if frame_type in ("ping", "pong"):
+                connection.heartbeats = True
+            if frame_type == "ping":
+                connection.enqueue(PONG_FRAME)
+                continue
+            if frame_type == "pong":
+                continue
             
-            # Send message to receiver if online
+            # Save the message (group commit shared with the other connections)
             receiver_id = message_data["receiver_id"]
-            await manager.send_personal_message(
-                json.dumps({
-                    "id": db_message.id,
-                    "sender_id": user_id,
-                    "receiver_id": receiver_id,
-                    "order_id": db_message.order_id,
-                    "content": db_message.content,
-                    "created_at": db_message.created_at.isoformat(),
-                    "is_read": db_message.is_read
-                }),
-                receiver_id
-            )
+            # Only clients that tag their messages get ack/error frames: older
+            # clients treat every frame on this socket as an incoming message
+            client_id = message_data.get("client_id")
+            if client_id is not None:
+                connection.receipts = True
+            try:
+                db_message = await message_writer.submit(
+                    sender_id=user_id,
+                    receiver_id=receiver_id,
+                    order_id=message_data.get("order_id"),
+                    content=message_data["content"],
+                )
+            except Exception:
+                if client_id is not None:
+                    connection.enqueue(json.dumps({
+                        "type": "error", "client_id": client_id, "detail": "Message could not be saved",
+                    }))
+                continue
+            payload = {
+                "id": db_message.id,
+                "sender_id": user_id,
+                "receiver_id": receiver_id,
+                "order_id": db_message.order_id,
+                "content": db_message.content,
+                "created_at": db_message.created_at.isoformat(),
+                "is_read": db_message.is_read
+            }
+            
+            # Acknowledge the sender once the message is durably stored
+            if client_id is not None:
+                connection.enqueue(json.dumps({
+                    "type": "ack", "client_id": client_id,
+                    "id": payload["id"], "created_at": payload["created_at"],
+                }))
+            
+            # Send message to receiver if online
+            await manager.send_personal_message(json.dumps(payload), receiver_id)
             
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        pass
+    finally:
+        await manager.disconnect(connection)
 
 
-@router.get("/conversations", response_model=List[MessageWithSender])
+@router.get("/stats")
+def get_connection_stats(
+    current_user: User = Depends(deps.get_current_user)
+):
+    """WebSocket delivery metrics of this worker (queue depth, dropped frames)"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return manager.stats()
+
+
+@router.get("/presence", response_model=List[UserPresence])
+def get_presence(
+    user_ids: List[int] = Query(..., max_length=200),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Online status and last-seen time of the given users (no database access)"""
+    return [manager.presence(user_id) for user_id in dict.fromkeys(user_ids)]
+
+
+@router.get("/conversations", response_model=List[ConversationSummary])
 def get_conversations(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header")
 ):
-    """Get all conversations for the current user"""
-    messages = db.query(Message).filter(
-        (Message.sender_id == current_user.id) | (Message.receiver_id == current_user.id)
-    ).order_by(Message.created_at.desc()).all()
+    """Get the current user's conversations (one row per thread), most recent activity first"""
+    query = db.query(Conversation).options(
+        joinedload(Conversation.user_a), joinedload(Conversation.user_b)
+    ).filter(
+        (Conversation.user_a_id == current_user.id) | (Conversation.user_b_id == current_user.id)
+    )
+    conversations = paginate(
+        query, [Conversation.last_message_at, Conversation.id],
+        limit=limit, cursor=cursor, response=response
+    )
     
-    # Add sender/receiver names
     result = []
-    for msg in messages:
-        msg_dict = MessageWithSender.from_orm(msg).dict()
-        msg_dict["sender_name"] = msg.sender.full_name if msg.sender else None
-        msg_dict["receiver_name"] = msg.receiver.full_name if msg.receiver else None
-        result.append(msg_dict)
+    for conv in conversations:
+        is_a = conv.user_a_id == current_user.id
+        other = conv.user_b if is_a else conv.user_a
+        result.append(ConversationSummary(
+            id=conv.id,
+            order_id=conv.order_id,
+            other_user_id=other.id if other else (conv.user_b_id if is_a else conv.user_a_id),
+            other_user_name=other.full_name if other else None,
+            last_message_id=conv.last_message_id,
+            last_message=conv.last_message_content,
+            last_sender_id=conv.last_sender_id,
+            last_message_at=conv.last_message_at,
+            unread_count=conv.unread_a if is_a else conv.unread_b,
+        ))
     
     return result
 
@@ -104,13 +151,18 @@ def get_conversations(
 @router.get("/order/{order_id}/messages", response_model=List[MessageWithSender])
 def get_order_messages(
     order_id: int,
+    response: Response,
     db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    current_user: User = Depends(deps.get_current_user),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header")
 ):
-    """Get all messages for a specific order"""
-    messages = db.query(Message).filter(
-        Message.order_id == order_id
-    ).order_by(Message.created_at.asc()).all()
+    """Get messages for a specific order, oldest first"""
+    query = db.query(Message).filter(Message.order_id == order_id)
+    messages = paginate(
+        query, [Message.created_at, Message.id], descending=False,
+        limit=limit, cursor=cursor, response=response
+    )
     
     # Add sender/receiver names
     result = []
@@ -130,15 +182,13 @@ def create_message(
     current_user: User = Depends(deps.get_current_user)
 ):
     """Create a new message (REST fallback if WebSocket not available)"""
-    db_message = Message(
+    db_message = ChatService.create_message(
+        db,
         sender_id=current_user.id,
         receiver_id=message.receiver_id,
         order_id=message.order_id,
         content=message.content,
-        created_at=datetime.utcnow(),
-        is_read=False
     )
-    db.add(db_message)
     db.commit()
     db.refresh(db_message)
     
@@ -149,23 +199,79 @@ def create_message(
     return msg_dict
 
 
+async def _mark_read(
+    db: AsyncSession,
+    reader_id: int,
+    other_id: int,
+    order_id: Optional[int],
+    up_to_message_id: int,
+    conversation_id: Optional[int] = None,
+) -> ReadReceipt:
+    """Apply a read watermark, commit, then push the receipt to both participants"""
+    marked, unread_count = await db.run_sync(
+        ChatService.mark_read_up_to, reader_id, other_id, order_id, up_to_message_id
+    )
+    await db.commit()
+    receipt = ReadReceipt(
+        conversation_id=conversation_id,
+        reader_id=reader_id,
+        order_id=order_id,
+        up_to_message_id=up_to_message_id,
+        marked_read=marked,
+        unread_count=unread_count,
+    )
+    if marked:
+        event = read_frame(receipt.model_dump(exclude={"marked_read", "unread_count"}))
+        # The sender sees the receipt, the reader's other devices clear their badge
+        # (connections that opted in to receipts only)
+        await manager.send_personal_message(event, other_id)
+        await manager.send_personal_message(event, reader_id)
+    return receipt
+
+
+@router.post("/conversations/{conversation_id}/read", response_model=ReadReceipt)
+async def mark_conversation_read(
+    conversation_id: int,
+    watermark: ReadWatermark,
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user_async)
+):
+    """Mark every message received in this conversation up to `up_to_message_id` as read"""
+    conversation = await db.get(Conversation, conversation_id)
+    if not conversation or current_user.id not in (conversation.user_a_id, conversation.user_b_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    other_id = conversation.user_b_id if conversation.user_a_id == current_user.id else conversation.user_a_id
+    return await _mark_read(
+        db, current_user.id, other_id, conversation.order_id, watermark.up_to_message_id,
+        conversation_id=conversation.id,
+    )
+
+
 @router.patch("/messages/{message_id}", response_model=MessageWithSender)
-def update_message(
+async def update_message(
     message_id: int,
     message_update: MessageUpdate,
-    db: Session = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_user)
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: User = Depends(deps.get_current_user_async)
 ):
-    """Mark message as read"""
-    db_message = db.query(Message).filter(Message.id == message_id).first()
+    """Mark message as read (kept for older clients, prefer POST /conversations/{id}/read)"""
+    db_message = await db.scalar(
+        select(Message)
+        .options(joinedload(Message.sender), joinedload(Message.receiver))
+        .where(Message.id == message_id)
+    )
     if not db_message:
         raise HTTPException(status_code=404, detail="Message not found")
+    if db_message.receiver_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the receiver can change the read status")
     
-    if message_update.is_read is not None:
-        db_message.is_read = message_update.is_read
-    
-    db.commit()
-    db.refresh(db_message)
+    if message_update.is_read:
+        # Reading a message also reads the earlier ones of the thread
+        await _mark_read(db, current_user.id, db_message.sender_id, db_message.order_id, db_message.id)
+    elif message_update.is_read is not None and db_message.is_read:
+        db_message.is_read = False
+        await db.run_sync(ChatService.record_read_change, db_message, True)
+        await db.commit()
     
     msg_dict = MessageWithSender.from_orm(db_message).dict()
     msg_dict["sender_name"] = db_message.sender.full_name if db_message.sender else None
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import logging
 
-from app.api.deps import get_current_user, get_db
-from app.models import User, CryptoWallet, CryptoTransaction, Order
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.api.deps import get_current_user_async, get_async_db
+from app.api.pagination import paginate_async
+from app.models import User, CryptoWallet, CryptoTransaction, Order, Product
 from app.schemas.crypto import (
     WalletCreate, WalletResponse,
     TransactionCreate, TransactionVerify, TransactionResponse,
     PaymentInitRequest, PaymentInitResponse
 )
-from app.services.crypto_service import CryptoService
+from app.services.crypto_service import CryptoService, bsc_rpc_client
+from app.services.payment_confirmations import OPEN_STATUSES, PaymentConfirmationService
+from app.services.price_oracle import PriceUnavailable, UnsupportedCurrency, price_oracle
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -19,15 +28,15 @@ router = APIRouter()
 @router.post("/wallet", response_model=WalletResponse)
 async def register_wallet(
     wallet: WalletCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Register a new cryptocurrency wallet address"""
     # Check if wallet already exists
-    existing = db.query(CryptoWallet).filter(
+    existing = await db.scalar(select(CryptoWallet).where(
         CryptoWallet.user_id == current_user.id,
         CryptoWallet.wallet_address == wallet.wallet_address
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -36,9 +45,9 @@ async def register_wallet(
         )
     
     # Set all other wallets as non-primary
-    db.query(CryptoWallet).filter(
+    await db.execute(update(CryptoWallet).where(
         CryptoWallet.user_id == current_user.id
-    ).update({"is_primary": False})
+    ).values(is_primary=False))
     
     # Create new wallet
     db_wallet = CryptoWallet(
@@ -49,22 +58,22 @@ async def register_wallet(
         is_primary=True
     )
     db.add(db_wallet)
-    db.commit()
-    db.refresh(db_wallet)
+    await db.commit()
+    await db.refresh(db_wallet)
     
     return db_wallet
 
 
 @router.get("/wallet", response_model=WalletResponse)
 async def get_my_wallet(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Get current user's primary wallet"""
-    wallet = db.query(CryptoWallet).filter(
+    wallet = await db.scalar(select(CryptoWallet).where(
         CryptoWallet.user_id == current_user.id,
         CryptoWallet.is_primary == True
-    ).first()
+    ))
     
     if not wallet:
         raise HTTPException(
@@ -77,13 +86,14 @@ async def get_my_wallet(
 
 @router.get("/wallets", response_model=List[WalletResponse])
 async def get_all_wallets(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Get all wallets for current user"""
-    return db.query(CryptoWallet).filter(
+    wallets = await db.scalars(select(CryptoWallet).where(
         CryptoWallet.user_id == current_user.id
-    ).all()
+    ))
+    return wallets.all()
 
 
 # ============ PAYMENT ENDPOINTS ============
@@ -91,15 +101,15 @@ async def get_all_wallets(
 @router.post("/payment/init", response_model=PaymentInitResponse)
 async def init_crypto_payment(
     request: PaymentInitRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Initialize a cryptocurrency payment for an order
     Returns seller's wallet address and deep link for payment
     """
     # Get the order
-    order = db.query(Order).filter(Order.id == request.order_id).first()
+    order = await db.get(Order, request.order_id)
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -114,10 +124,10 @@ async def init_crypto_payment(
         )
     
     # Get seller's wallet
-    seller_wallet = db.query(CryptoWallet).filter(
+    seller_wallet = await db.scalar(select(CryptoWallet).where(
         CryptoWallet.user_id == order.seller_id,
         CryptoWallet.is_primary == True
-    ).first()
+    ))
     
     if not seller_wallet:
         raise HTTPException(
@@ -125,8 +135,30 @@ async def init_crypto_payment(
             detail="Seller has no crypto wallet configured"
         )
     
-    # Convert price to crypto (USDT = 1:1 with USD)
-    crypto_amount = CryptoService.usd_to_crypto(order.total_price, "USDT")
+    # Convert the order total from the product's currency to USDT (cached rates)
+    price_currency = await db.scalar(select(Product.currency).where(Product.id == order.product_id))
+    try:
+        crypto_amount = await price_oracle.convert(order.total_price, price_currency or "TON", "USDT")
+    except UnsupportedCurrency as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except PriceUnavailable:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Exchange rate unavailable, try again later"
+        )
+    crypto_amount = round(crypto_amount, 2)
+    
+    # Transfers mined up to the current head cannot pay this order. Read from
+    # the node, not the explorer: checkout does not queue behind the poller's
+    # rate-limited BscScan calls
+    try:
+        start_block = int(await bsc_rpc_client.call("eth_blockNumber", []), 16)
+    except Exception as e:
+        logger.warning(f"BSC head unavailable, order {order.id} can only be paid by tx hash: {e}")
+        start_block = None
     
     # Create pending transaction record
     transaction = CryptoTransaction(
@@ -136,11 +168,12 @@ async def init_crypto_payment(
         amount=crypto_amount,
         currency="USDT",
         network=seller_wallet.network,
+        start_block=start_block,
         status="pending"
     )
     db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    await db.commit()
+    await db.refresh(transaction)
     
     # Generate deep link
     deep_link = CryptoService.generate_safepal_deep_link(
@@ -163,70 +196,119 @@ async def init_crypto_payment(
 @router.post("/payment/verify", response_model=TransactionResponse)
 async def verify_crypto_payment(
     request: TransactionVerify,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Verify a cryptocurrency payment using transaction hash
+
+    The hash is attached to the pending payment `transaction_id` (from
+    /payment/init) and checked once on chain: its receipt must contain a USDT
+    Transfer of exactly the payment's amount to the seller's wallet. Payments
+    not confirmed yet are confirmed by the background poller: poll
+    GET /transactions/{id}.
     """
-    # Find pending transaction by hash or create verification
-    transaction = db.query(CryptoTransaction).filter(
-        CryptoTransaction.tx_hash == request.tx_hash
-    ).first()
-    
-    if transaction and transaction.status == "confirmed":
-        return transaction
+    # Find my transaction by hash or attach the hash to my pending payment
+    transaction = await db.scalar(select(CryptoTransaction).join(Order).where(
+        CryptoTransaction.tx_hash == request.tx_hash,
+        or_(
+            Order.buyer_id == current_user.id,
+            Order.seller_id == current_user.id
+        )
+    ))
     
-    # Verify on blockchain
-    result = await CryptoService.verify_bsc_transaction(request.tx_hash)
+    if transaction is None and request.transaction_id is not None:
+        transaction = await db.scalar(select(CryptoTransaction).join(Order).where(
+            CryptoTransaction.id == request.transaction_id,
+            CryptoTransaction.tx_hash.is_(None),
+            CryptoTransaction.status == "pending",
+            Order.buyer_id == current_user.id
+        ))
+        if transaction:
+            transaction.tx_hash = request.tx_hash
+            try:
+                await db.commit()
+            except IntegrityError:
+                # tx_hash is unique: another payment already claims this transaction
+                await db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Transaction hash already attached to another payment"
+                )
     
-    if not result["success"]:
+    if not transaction:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=result.get("error", "Transaction verification failed")
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No pending transaction found for this order"
         )
     
-    if transaction:
-        # Update existing transaction
-        transaction.tx_hash = request.tx_hash
-        transaction.status = result["status"]
-        transaction.from_address = result.get("from_address", "")
-        transaction.block_number = result.get("block_number", 0)
-        transaction.confirmations = result.get("confirmations", 0)
-        
-        if result["status"] == "confirmed":
-            from datetime import datetime
-            transaction.confirmed_at = datetime.utcnow()
-            
-            # Update order status
-            order = db.query(Order).filter(Order.id == transaction.order_id).first()
-            if order:
-                order.status = "paid"
-        
-        db.commit()
-        db.refresh(transaction)
+    if transaction.status not in OPEN_STATUSES:
         return transaction
     
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail="No pending transaction found for this order"
-    )
+    # Verify on blockchain; on explorer errors the poller retries later
+    try:
+        updates = await PaymentConfirmationService.check([{
+            "id": transaction.id,
+            "order_id": transaction.order_id,
+            "tx_hash": transaction.tx_hash,
+            "to_address": transaction.to_address,
+            "amount": transaction.amount,
+            "currency": transaction.currency
+        }])
+    except Exception as e:
+        logger.warning(f"Payment check failed for transaction {transaction.id}: {e}")
+        return transaction
+    
+    if updates:
+        await db.run_sync(PaymentConfirmationService.apply, updates)
+        await db.commit()
+        await db.refresh(transaction)
+    return transaction
 
 
 @router.get("/transactions", response_model=List[TransactionResponse])
 async def get_my_transactions(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header")
 ):
-    """Get all crypto transactions for current user's orders"""
+    """Get crypto transactions for current user's orders, newest first"""
     # Get user's orders (as buyer or seller)
-    from sqlalchemy import or_
+    stmt = select(CryptoTransaction).join(Order).where(
+        or_(
+            Order.buyer_id == current_user.id,
+            Order.seller_id == current_user.id
+        )
+    )
     
-    transactions = db.query(CryptoTransaction).join(Order).filter(
+    return await paginate_async(
+        db, stmt, [CryptoTransaction.created_at, CryptoTransaction.id],
+        limit=limit, cursor=cursor, skip=skip, response=response
+    )
+
+
+@router.get("/transactions/{transaction_id}", response_model=TransactionResponse)
+async def get_transaction(
+    transaction_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Get one of my crypto transactions (its confirmation state, without calling the explorer)"""
+    transaction = await db.scalar(select(CryptoTransaction).join(Order).where(
+        CryptoTransaction.id == transaction_id,
         or_(
             Order.buyer_id == current_user.id,
             Order.seller_id == current_user.id
         )
-    ).order_by(CryptoTransaction.created_at.desc()).all()
+    ))
+    
+    if not transaction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Transaction not found"
+        )
     
-    return transactions
+    return transaction
@@ -1,27 +1,42 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session, contains_eager
 from app import models
-from app.schemas.favorite import FavoriteResponse, FavoriteWithProduct
+from app.schemas.favorite import (
+    FavoriteCheckRequest, FavoriteCheckResponse, FavoriteResponse, FavoriteWithProduct,
+)
 from app.api import deps
+from app.api.pagination import paginate
+from app.services.favorite_service import FavoriteService
+from app.services.popularity_service import PopularityService
 
 router = APIRouter()
 
 @router.get("/", response_model=List[FavoriteWithProduct])
 def get_favorites(
+    response: Response,
     db: Session = Depends(deps.get_db),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get all favorites for current user.
+    Get favorites for current user, newest first.
+    Products are loaded in the same query; pass the X-Next-Cursor header back as `cursor` for the next page.
     """
-    favorites = db.query(models.Favorite).filter(
+    query = db.query(models.Favorite).outerjoin(models.Favorite.product).options(
+        contains_eager(models.Favorite.product)
+    ).filter(
         models.Favorite.user_id == current_user.id
-    ).all()
+    )
+    favorites = paginate(
+        query, [models.Favorite.created_at, models.Favorite.id],
+        limit=limit, cursor=cursor, response=response,
+    )
     
     result = []
     for fav in favorites:
-        product = db.query(models.Product).filter(models.Product.id == fav.product_id).first()
+        product = fav.product
         result.append(FavoriteWithProduct(
             id=fav.id,
             user_id=fav.user_id,
@@ -34,6 +49,20 @@ def get_favorites(
     
     return result
 
+@router.post("/check", response_model=FavoriteCheckResponse)
+def check_favorites(
+    favorite_in: FavoriteCheckRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Check many products at once (e.g. a page of product cards).
+    Returns the ids among `product_ids` that are in the user's favorites.
+    """
+    return FavoriteCheckResponse(
+        favorite_ids=FavoriteService.filter_favorites(db, current_user.id, favorite_in.product_ids)
+    )
+
 @router.post("/{product_id}", response_model=FavoriteResponse, status_code=status.HTTP_201_CREATED)
 def add_favorite(
     product_id: int,
@@ -62,8 +91,10 @@ def add_favorite(
         product_id=product_id
     )
     db.add(favorite)
+    PopularityService.favorite_added(db, product_id)
     db.commit()
     db.refresh(favorite)
+    FavoriteService.added(current_user.id, product_id)
     return favorite
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -85,6 +116,7 @@ def remove_favorite(
     
     db.delete(favorite)
     db.commit()
+    FavoriteService.removed(current_user.id, product_id)
 
 @router.get("/check/{product_id}")
 def check_favorite(
@@ -95,9 +127,4 @@ def check_favorite(
     """
     Check if a product is in favorites.
     """
-    favorite = db.query(models.Favorite).filter(
-        models.Favorite.user_id == current_user.id,
-        models.Favorite.product_id == product_id
-    ).first()
-    
-    return {"is_favorite": favorite is not None}
+    return {"is_favorite": product_id in FavoriteService.get_favorite_ids(db, current_user.id)}
@@ -1,28 +1,28 @@
 from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
 from app.api import deps
 from app.core import security
 from app.core.config import settings
+from app.services.google_auth_service import google_verifier, GoogleCertsUnavailable
 
 router = APIRouter()
 
 @router.post("/login/google", response_model=schemas.Token)
-def login_google(
-    db: Session = Depends(deps.get_db),
+async def login_google(
+    db: AsyncSession = Depends(deps.get_async_db),
     token: str = Body(..., embed=True)
 ) -> Any:
     """
     Login with Google ID Token. (For Buyers only by default, or auto-detect)
     """
     try:
-        # Verify Token
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), settings.GOOGLE_CLIENT_ID)
+        # Verify Token (cached Google certs, signature checked off the event loop)
+        idinfo = await google_verifier.verify(token, settings.GOOGLE_CLIENT_ID)
         
         # Get User Info
         email = idinfo['email']
@@ -30,7 +30,7 @@ def login_google(
         name = idinfo.get('name')
         
         # Check if user exists
-        user = db.query(models.User).filter(models.User.email == email).first()
+        user = await db.scalar(select(models.User).where(models.User.email == email))
         
         if user:
             # If user exists, check if google_id matches (optional security)
@@ -38,7 +38,7 @@ def login_google(
                 # Link account if not linked yet? Or fail? 
                 # For this app, simply updating it is better UX.
                 user.google_id = google_id
-                db.commit()
+                await db.commit()
             if not user.is_active:
                  raise HTTPException(status_code=400, detail="Inactive user")
         else:
@@ -51,8 +51,8 @@ def login_google(
                 is_vendor=False # Forces buyer role for Google Sign-in
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
             
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         return {
@@ -62,5 +62,7 @@ def login_google(
             "token_type": "bearer",
         }
 
+    except GoogleCertsUnavailable:
+        raise HTTPException(status_code=503, detail="Google sign-in temporarily unavailable")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid Google Token")
@@ -1,10 +1,12 @@
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from app import models
 from app.api import deps
-from app.services.notification_service import NotificationService
+from app.core.principal_cache import principal_cache
+from app.services.notification_outbox import NotificationOutboxService
 
 router = APIRouter()
 
@@ -21,38 +23,38 @@ class TestNotification(BaseModel):
 @router.put("/fcm-token")
 async def update_fcm_token(
     token_data: FCMTokenUpdate,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> dict:
     """
     Update the FCM token for the current user
     """
-    current_user.fcm_token = token_data.fcm_token
-    db.add(current_user)
-    db.commit()
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == current_user.id)
+        .values(fcm_token=token_data.fcm_token)
+    )
+    await db.commit()
+    principal_cache.invalidate(current_user.id)
     return {"message": "FCM token updated successfully"}
 
 
 @router.post("/test")
 async def send_test_notification(
     notification: TestNotification,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: models.User = Depends(deps.get_current_active_user_async),
 ) -> dict:
     """
-    Send a test notification to the current user
+    Queue a test notification to the current user (sent by the outbox worker)
     """
     if not current_user.fcm_token:
         raise HTTPException(status_code=400, detail="No FCM token registered")
     
-    success = await NotificationService.send_to_device(
-        token=current_user.fcm_token,
-        title=notification.title,
-        body=notification.body,
-        data={"type": "test"}
-    )
-    
-    if success:
-        return {"message": "Notification sent successfully"}
-    else:
-        raise HTTPException(status_code=500, detail="Failed to send notification")
+    row = NotificationOutboxService.enqueue(db, current_user.id, "test", {
+        "title": notification.title,
+        "body": notification.body,
+        "data": {"type": "test"},
+    })
+    await db.commit()
+    return {"message": "Notification queued", "id": row.id}
@@ -1,10 +1,14 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app import models, schemas
 from app.api import deps
+from app.api.pagination import paginate
 from app.models.order import OrderStatus
+from app.services.notification_outbox import NotificationOutboxService
+from app.services.popularity_service import PopularityService
+from app.services.notification_service import NotificationTypes
 
 router = APIRouter()
 
@@ -45,55 +49,75 @@ def create_order(
         payment_method=order_in.payment_method,
     )
     db.add(db_order)
+    db.flush()
+    PopularityService.order_created(db, product.id)
+    NotificationOutboxService.enqueue(
+        db, product.seller_id, "order_created", NotificationTypes.order_created(db_order.id, product.title)
+    )
     db.commit()
     db.refresh(db_order)
     return db_order
 
 @router.get("/", response_model=List[schemas.Order])
 def read_orders(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
 ) -> Any:
     """
-    Retrieve orders for current user (as buyer or seller).
+    Retrieve orders for current user (as buyer or seller), newest first.
     """
-    orders = db.query(models.Order).filter(
+    query = db.query(models.Order).filter(
         (models.Order.buyer_id == current_user.id) | 
         (models.Order.seller_id == current_user.id)
-    ).offset(skip).limit(limit).all()
-    return orders
+    )
+    return paginate(
+        query, [models.Order.created_at, models.Order.id],
+        limit=limit, cursor=cursor, skip=skip, response=response
+    )
 
 @router.get("/purchases", response_model=List[schemas.Order])
 def read_purchases(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
 ) -> Any:
     """
-    Retrieve orders where current user is the buyer.
+    Retrieve orders where current user is the buyer, newest first.
     """
-    orders = db.query(models.Order).filter(
+    query = db.query(models.Order).filter(
         models.Order.buyer_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return orders
+    )
+    return paginate(
+        query, [models.Order.created_at, models.Order.id],
+        limit=limit, cursor=cursor, skip=skip, response=response
+    )
 
 @router.get("/sales", response_model=List[schemas.Order])
 def read_sales(
+    response: Response,
     db: Session = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_active_user),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
 ) -> Any:
     """
-    Retrieve orders where current user is the seller.
+    Retrieve orders where current user is the seller, newest first.
     """
-    orders = db.query(models.Order).filter(
+    query = db.query(models.Order).filter(
         models.Order.seller_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return orders
+    )
+    return paginate(
+        query, [models.Order.created_at, models.Order.id],
+        limit=limit, cursor=cursor, skip=skip, response=response
+    )
 
 @router.get("/{order_id}", response_model=schemas.Order)
 def read_order(
@@ -188,6 +212,18 @@ def update_order_status(
     # Update status
     order.status = new_status
     db.add(order)
+    
+    # Notify the other party (sent by the outbox worker after commit)
+    if new_status == OrderStatus.PAID_ESCROW:
+        NotificationOutboxService.enqueue(db, order.seller_id, "order_paid", NotificationTypes.order_paid(order.id))
+    elif new_status == OrderStatus.SHIPPED:
+        NotificationOutboxService.enqueue(
+            db, order.buyer_id, "order_shipped",
+            NotificationTypes.order_shipped(order.id, order.tracking_number or "")
+        )
+    elif new_status == OrderStatus.DELIVERED:
+        NotificationOutboxService.enqueue(db, order.seller_id, "order_delivered", NotificationTypes.order_delivered(order.id))
+    
     db.commit()
     db.refresh(order)
     return order
@@ -1,63 +1,74 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from app import models, schemas
 from app.api import deps
+from app.api.pagination import paginate
+from app.services.product_pricing import ProductPricing
+from app.services.search_service import SearchService
+from app.services.view_counter import view_counter
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Product])
 def read_products(
+    response: Response,
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
     search: Optional[str] = Query(None, description="Search in title and description"),
-    min_price: Optional[float] = Query(None, ge=0, description="Minimum price filter"),
-    max_price: Optional[float] = Query(None, ge=0, description="Maximum price filter"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price filter (USD)"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price filter (USD)"),
     category: Optional[str] = Query(None, description="Category filter"),
-    sort_by: Optional[str] = Query(None, description="Sort: price_asc, price_desc, newest, popular"),
+    sort_by: Optional[str] = Query(None, description="Sort: relevance, price_asc, price_desc, newest, popular"),
 ) -> Any:
     """
     Retrieve products with optional search and filters.
+    Search results are ranked by relevance unless another sort is requested.
+    Pass `cursor` to fetch the next page (not available for relevance sort).
+    Price filters and sorts use the price converted to USD (`price_base`).
+    Products in a currency without an exchange rate have no `price_base`:
+    they are left out of results filtered or sorted by price.
     """
     query = db.query(models.Product)
     
-    # Search filter
+    # Search filter (full-text index)
+    rank = None
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.Product.title.ilike(search_term),
-                models.Product.description.ilike(search_term)
-            )
-        )
+        query, rank = SearchService.apply_search(db, query, search)
     
-    # Price filters
+    # Price filters, in the reference currency
     if min_price is not None:
-        query = query.filter(models.Product.price >= min_price)
+        query = query.filter(models.Product.price_base >= min_price)
     if max_price is not None:
-        query = query.filter(models.Product.price <= max_price)
+        query = query.filter(models.Product.price_base <= max_price)
     
     # Category filter
     if category:
         query = query.filter(models.Product.category == category)
     
     # Sorting
-    if sort_by == "price_asc":
-        query = query.order_by(models.Product.price.asc())
-    elif sort_by == "price_desc":
-        query = query.order_by(models.Product.price.desc())
-    elif sort_by == "newest":
-        query = query.order_by(models.Product.created_at.desc())
+    if rank is not None and sort_by in (None, "relevance"):
+        # Relevance ranks can't be used as a keyset, page with offset
+        query = query.order_by(rank.desc(), models.Product.id.desc())
+        return query.offset(skip).limit(limit).all()
+
+    if sort_by in ("price_asc", "price_desc"):
+        # Products without a known rate can't be placed (or paged) by price
+        query = query.filter(models.Product.price_base.isnot(None))
+        columns, descending = [models.Product.price_base, models.Product.id], sort_by == "price_desc"
     elif sort_by == "popular":
-        # Could be based on order count or views
-        query = query.order_by(models.Product.id.desc())
+        # Time-decayed orders and favorites, see PopularityService
+        columns, descending = [models.Product.popularity, models.Product.id], True
     else:
-        query = query.order_by(models.Product.created_at.desc())
-    
-    products = query.offset(skip).limit(limit).all()
-    return products
+        sort_by = "newest"
+        columns, descending = [models.Product.created_at, models.Product.id], True
+
+    return paginate(
+        query, columns, descending=descending, sort=sort_by,
+        limit=limit, cursor=cursor, skip=skip, response=response
+    )
 
 @router.post("/", response_model=schemas.Product)
 def create_product(
@@ -79,6 +90,7 @@ def create_product(
         **product_in.model_dump(),
         seller_id=current_user.id
     )
+    ProductPricing.apply(db_product)
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
@@ -91,11 +103,12 @@ def read_product(
     product_id: int,
 ) -> Any:
     """
-    Get product by ID.
+    Get product by ID. Counts one view (written in the next batch).
     """
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    view_counter.record(product_id)
     return product
 
 @router.put("/{product_id}", response_model=schemas.Product)
@@ -123,6 +136,8 @@ def update_product(
     update_data = product_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(product, field, value)
+    if "price" in update_data or "currency" in update_data:
+        ProductPricing.apply(product)
         
     db.add(product)
     db.commit()
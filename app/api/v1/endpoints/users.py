@@ -1,6 +1,7 @@
 from typing import Any, List
 from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
 from app.api import deps
 from app.core import security
@@ -8,15 +9,15 @@ from app.core import security
 router = APIRouter()
 
 @router.post("/", response_model=schemas.User)
-def create_user(
+async def create_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_in: schemas.UserCreate,
 ) -> Any:
     """
     Create new user.
     """
-    user = db.query(models.User).filter(models.User.email == user_in.email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == user_in.email))
     if user:
         raise HTTPException(
             status_code=400,
@@ -32,13 +33,13 @@ def create_user(
 
     db_user = models.User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        hashed_password=await security.password_hasher.hash(user_in.password),
         full_name=user_in.full_name,
         is_vendor=user_in.is_vendor
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/me", response_model=schemas.User)
@@ -46,6 +47,6 @@ def read_user_me(
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get current user.
+    Get current user. Served from the cached principal: no query on a cache hit.
     """
     return current_user
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, Optional
 import os
 
 class Settings(BaseSettings):
@@ -15,18 +15,121 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "postgres"
     POSTGRES_DB: str = "emobile"
 
+    # Startup schema handling: migrate, check (revision only) or skip
+    DB_STARTUP_MODE: str = "migrate"
+
+    # Per-request SQL instrumentation (X-DB-* response headers and logs)
+    SQL_INSTRUMENTATION: bool = True
+    SQL_SLOW_QUERY_MS: int = 200
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # same statement shape this many times in one request
+
     # Security
     SECRET_KEY: str = "dev-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 jours
+    BCRYPT_ROUNDS: int = 12  # existing hashes are upgraded on next login when this changes
+    PASSWORD_HASH_WORKERS: int = 2  # dedicated bcrypt threads, separate from the request threadpool
+    PASSWORD_HASH_MAX_PENDING: int = 32  # beyond this, login/register fail fast with 503
     GOOGLE_CLIENT_ID: Optional[str] = None
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
     
     # Firebase Cloud Messaging
     FCM_SERVER_KEY: Optional[str] = None
+    FCM_API_URL: str = "https://fcm.googleapis.com/fcm/send"
+    FCM_TIMEOUT: float = 10.0  # seconds per request
+    FCM_MAX_CONCURRENCY: int = 10  # requests in flight (and pooled connections)
+    FCM_BATCH_SIZE: int = 1000  # tokens per request, FCM's registration_ids limit
+
+    # BscScan explorer (payment verification)
+    BSCSCAN_API_URL: str = "https://api.bscscan.com/api"
+    BSCSCAN_API_KEY: Optional[str] = None  # optional, raises the rate limit
+    BSCSCAN_TIMEOUT: float = 10.0  # seconds per request
+    BSCSCAN_MAX_CONCURRENCY: int = 5  # requests in flight
+    BSCSCAN_RATE_LIMIT: float = 5.0  # requests started per second (free tier: 5 calls/s)
+    BSC_VERIFY_CACHE_TTL: int = 24 * 3600  # seconds a final verification result is reused
+    BSC_VERIFY_CACHE_MAX: int = 10000
+    BSC_CONFIRMATIONS: int = 12  # blocks on top of a payment before its order is paid
+
+    # BSC JSON-RPC node (eth_getLogs for the USDT transfer indexer)
+    BSC_RPC_URL: str = "https://bsc-dataseed.binance.org"
+    BSC_RPC_TIMEOUT: float = 20.0  # seconds per request
+    BSC_RPC_MAX_CONCURRENCY: int = 4
+
+    # Indexer matching incoming USDT transfers to pending payments
+    INDEXER_POLL_INTERVAL: float = 15.0  # seconds
+    INDEXER_BLOCK_RANGE: int = 1000  # blocks per eth_getLogs query
+    INDEXER_ADDRESSES_PER_QUERY: int = 100  # seller addresses OR-ed in one query
+    INDEXER_BACKFILL_BLOCKS: int = 20000  # max blocks behind the head a scan starts
+
+    # Background confirmation of pending crypto payments
+    PAYMENT_POLL_INTERVAL: float = 15.0  # seconds
+    PAYMENT_POLL_BATCH_SIZE: int = 50  # transactions per batch (one eth_blockNumber call each)
+
+    # Exchange rates (product prices, crypto checkout): coingecko or static
+    PRICE_SOURCE: str = "coingecko"
+    PRICE_API_URL: str = "https://api.coingecko.com/api/v3/simple/price"
+    PRICE_TIMEOUT: float = 10.0  # seconds per request
+    PRICE_TTL: float = 60.0  # seconds a quote is fresh (and refresh interval)
+    PRICE_MAX_STALE: float = 3600.0  # stale quotes served meanwhile up to this age
+    PRICE_STATIC_USD: Dict[str, float] = {"TON": 5.0, "BNB": 600.0, "ETH": 3000.0, "EUR": 1.08}  # static source
+    PRICE_BASE_RECOMPUTE_THRESHOLD: float = 0.005  # relative rate move before Product.price_base is rewritten
+
+    # Notification outbox worker
+    OUTBOX_POLL_INTERVAL: float = 2.0  # seconds
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_LEASE: int = 60  # seconds a claimed row is hidden from other workers
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE: float = 5.0  # seconds before the first retry, doubled each time
+    OUTBOX_BACKOFF_MAX: float = 3600.0
+    OUTBOX_RETENTION_DAYS: int = 7  # sent/skipped rows kept this long
+
+    # Chat pushes to one receiver for one thread within this window become one "N new messages" push
+    CHAT_PUSH_WINDOW: float = 10.0  # seconds
 
     # Redis (optional)
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Chat fan-out across workers: memory (single worker) or redis
+    CHAT_BROKER: str = "memory"
+
+    # Outbound WebSocket frames buffered per connection; when full either
+    # drop_oldest (lossy) or disconnect the slow consumer
+    WS_SEND_QUEUE_SIZE: int = 100
+    WS_OVERFLOW_POLICY: str = "drop_oldest"
+    WS_SEND_TIMEOUT: float = 10.0  # seconds for one frame before giving up on the client
+
+    # Heartbeat: {"type": "ping"} every interval, sockets silent for the timeout are closed
+    WS_PING_INTERVAL: float = 25.0
+    WS_IDLE_TIMEOUT: float = 60.0
+
+    # Group commit of chat messages received over WebSocket
+    CHAT_BATCH_MAX_SIZE: int = 100
+    CHAT_BATCH_MAX_DELAY: float = 0.01  # seconds waited for a batch to fill
+
+    # Last-seen times kept in memory for disconnected users
+    PRESENCE_TTL: int = 7 * 24 * 3600  # seconds
+    PRESENCE_MAX_USERS: int = 100000
+
+    # Authenticated user cache (get_current_user): memory, redis or none
+    PRINCIPAL_CACHE_BACKEND: str = "memory"
+    PRINCIPAL_CACHE_TTL: int = 30  # seconds
+    PRINCIPAL_CACHE_MAX_USERS: int = 10000
+
+    # Popularity score for sort_by=popular (time-decayed orders, favorites and views)
+    POPULARITY_ORDER_WEIGHT: float = 5.0
+    POPULARITY_FAVORITE_WEIGHT: float = 2.0
+    POPULARITY_VIEW_WEIGHT: float = 0.1
+    POPULARITY_HALF_LIFE_DAYS: float = 7.0
+    POPULARITY_WINDOW_DAYS: int = 90  # events older than this are dropped by the bulk rebuild
+    POPULARITY_REFRESH_INTERVAL: float = 3600.0  # seconds between bulk rebuilds
+
+    # Product views buffered in memory and written in one batch per interval
+    VIEW_FLUSH_INTERVAL: float = 5.0  # seconds
+
+    # Per-user favorite product ids (heart icons)
+    FAVORITES_CACHE_TTL: int = 60  # seconds
+    FAVORITES_CACHE_MAX_USERS: int = 10000
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
@@ -54,5 +157,17 @@ class Settings(BaseSettings):
         # Priority 2: Use SQLite for local development
         return "sqlite:///./sql_app.db"
 
+    def get_async_database_url(self) -> str:
+        # Same database, through the asyncio drivers (asyncpg / aiosqlite)
+        url = self.get_database_url()
+        if url.startswith("sqlite:"):
+            return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+        for prefix in ("postgresql+psycopg2://", "postgresql://"):
+            if url.startswith(prefix):
+                url = url.replace(prefix, "postgresql+asyncpg://", 1)
+                # asyncpg spells libpq's sslmode as ssl
+                return url.replace("sslmode=", "ssl=")
+        return url
+
 settings = Settings()
 
@@ -0,0 +1,185 @@
+"""
+Cache of authenticated principals for deps.get_current_user.
+
+Entries are keyed by user id and access token, so a cache hit skips the
+`SELECT` on users (and /users/me is answered from the snapshot). Snapshots
+must be invalidated whenever a cached field changes (is_active, is_vendor,
+fcm_token, rating...): call `principal_cache.invalidate(user_id)`. ORM
+flushes of those fields do it automatically; bulk UPDATE statements must
+call it explicitly.
+
+Backends: "memory" (per process, default), "redis" (shared via REDIS_URL) or "none".
+With the memory backend and several workers, a change made on one worker is
+seen by the others after PRINCIPAL_CACHE_TTL seconds at most. Async code uses
+`aget`/`aset`, which run the Redis round trips in a worker thread instead of
+on the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Columns copied into the cached snapshot: identity, authorization and what
+# /users/me returns (never the password hash)
+PRINCIPAL_FIELDS = (
+    "id", "email", "full_name", "is_active", "is_superuser", "is_vendor", "fcm_token", "rating",
+)
+
+# A change of one of these invalidates the user's cached principals
+INVALIDATING_FIELDS = PRINCIPAL_FIELDS[1:]
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class MemoryPrincipalBackend:
+    """user id -> {token digest: (expires_at, snapshot)}, LRU-bounded by user"""
+
+    blocking = False  # in-process, safe to call from the event loop
+
+    def __init__(self, max_users: int, ttl: int):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize=max_users, ttl=ttl)
+
+    def get(self, user_id: int, digest: str) -> Optional[dict]:
+        entry = self._cache.get(user_id)
+        if not entry or digest not in entry:
+            return None
+        expires_at, snapshot = entry[digest]
+        return snapshot if expires_at > time.monotonic() else None
+
+    def set(self, user_id: int, digest: str, snapshot: dict) -> None:
+        now = time.monotonic()
+        entry = {
+            key: item for key, item in (self._cache.get(user_id) or {}).items()
+            if item[0] > now
+        }
+        entry[digest] = (now + self.ttl, snapshot)
+        self._cache.set(user_id, entry)
+
+    def invalidate(self, user_id: int) -> None:
+        self._cache.pop(user_id)
+
+
+class RedisPrincipalBackend:
+    """One hash per user (`principal:{id}`), one field per token digest"""
+
+    blocking = True  # network round trips
+
+    def __init__(self, url: str, ttl: int):
+        import redis  # optional dependency
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+    def get(self, user_id: int, digest: str) -> Optional[dict]:
+        raw = self._client.hget(self._key(user_id), digest)
+        if raw is None:
+            return None
+        item = json.loads(raw)
+        return item["user"] if item["exp"] > time.time() else None
+
+    def set(self, user_id: int, digest: str, snapshot: dict) -> None:
+        key = self._key(user_id)
+        pipe = self._client.pipeline()
+        pipe.hset(key, digest, json.dumps({"exp": time.time() + self.ttl, "user": snapshot}))
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def invalidate(self, user_id: int) -> None:
+        self._client.delete(self._key(user_id))
+
+
+class PrincipalCache:
+    """Front for the configured backend. Backend errors degrade to a cache miss."""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @classmethod
+    def from_settings(cls) -> "PrincipalCache":
+        kind = settings.PRINCIPAL_CACHE_BACKEND
+        if kind == "redis":
+            try:
+                return cls(RedisPrincipalBackend(settings.REDIS_URL, settings.PRINCIPAL_CACHE_TTL))
+            except ImportError:
+                logger.warning("redis package not installed, using in-memory principal cache")
+        if kind == "none":
+            return cls(None)
+        return cls(MemoryPrincipalBackend(settings.PRINCIPAL_CACHE_MAX_USERS, settings.PRINCIPAL_CACHE_TTL))
+
+    def get(self, user_id: int, token: str) -> Optional[User]:
+        """
+        Return a detached User built from the cached snapshot, or None.
+        It has its identity key, so `db.add()`/`db.merge()` attach it instead
+        of inserting a new user; other columns and relationships are loaded
+        once it is attached, and raise DetachedInstanceError before that.
+        """
+        if self.backend is None:
+            return None
+        try:
+            snapshot = self.backend.get(user_id, _token_digest(token))
+        except Exception as e:
+            logger.warning(f"Principal cache read failed: {e}")
+            return None
+        if snapshot is None:
+            return None
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, user: User, token: str) -> None:
+        if self.backend is None:
+            return
+        snapshot = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        try:
+            self.backend.set(user.id, _token_digest(token), snapshot)
+        except Exception as e:
+            logger.warning(f"Principal cache write failed: {e}")
+
+    async def aget(self, user_id: int, token: str) -> Optional[User]:
+        """`get` for async code: a blocking backend is called from a worker thread"""
+        if self.backend is not None and self.backend.blocking:
+            return await asyncio.to_thread(self.get, user_id, token)
+        return self.get(user_id, token)
+
+    async def aset(self, user: User, token: str) -> None:
+        """`set` for async code: a blocking backend is called from a worker thread"""
+        if self.backend is not None and self.backend.blocking:
+            await asyncio.to_thread(self.set, user, token)
+        else:
+            self.set(user, token)
+
+    def invalidate(self, user_id: int) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.invalidate(user_id)
+        except Exception as e:
+            logger.warning(f"Principal cache invalidation failed for user {user_id}: {e}")
+
+
+principal_cache = PrincipalCache.from_settings()
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_change(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in INVALIDATING_FIELDS):
+        principal_cache.invalidate(target.id)
@@ -0,0 +1,60 @@
+"""
+Schema management at startup.
+
+DB_STARTUP_MODE:
+- "migrate": run `alembic upgrade head` (local development, single instance)
+- "check":   only compare the database revision with the migration head and
+             refuse to start on mismatch. One query, for fast cold starts and
+             scale-out. Migrations run once per deploy, before the new
+             instances start: the Procfile `release` process and Railway's
+             preDeployCommand (railway.json).
+- "skip":    do nothing
+"""
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+
+
+def get_alembic_config() -> Config:
+    config = Config(os.path.abspath(ALEMBIC_INI))
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(os.path.abspath(ALEMBIC_INI)), "alembic")
+    )
+    # Keep the application's logging configuration
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade_to_head() -> None:
+    command.upgrade(get_alembic_config(), "head")
+
+
+def check_revision(engine: Engine) -> None:
+    head = ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. "
+            f"Run `alembic upgrade head`."
+        )
+
+
+def prepare_database(engine: Engine, mode: str) -> None:
+    if mode == "migrate":
+        logger.info("Applying database migrations...")
+        upgrade_to_head()
+    elif mode == "check":
+        check_revision(engine)
+        logger.info("Database schema is up to date")
+    elif mode != "skip":
+        raise ValueError(f"Unknown DB_STARTUP_MODE {mode!r}")
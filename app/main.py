@@ -1,11 +1,27 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
 from contextlib import asynccontextmanager
 from app.api.v1.api import api_router
+from app.api.pagination import NEXT_CURSOR_HEADER
 from app.core.config import settings
-from app.db.session import engine, Base
+from app.core.security import password_hasher, PasswordHasherBusy
+from app.db.session import engine, async_engine
+from app.db.migrations import prepare_database
+from app.db.instrumentation import instrument, track_queries
+from app.services.connection_manager import manager
+from app.services.crypto_service import bscscan_client, bsc_rpc_client
+from app.services.message_writer import message_writer
+from app.services.notification_service import fcm_client
+from app.services.notification_outbox import outbox_worker
+from app.services.payment_confirmations import confirmation_poller
+from app.services.transfer_indexer import transfer_indexer
+from app.services.price_oracle import price_oracle
+from app.services.product_pricing import ProductPricing
+from app.services.popularity_service import popularity_refresher
+from app.services.view_counter import view_counter
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -13,15 +29,32 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Démarrage : Création des tables
-    try:
-        logger.info("Creating database tables...")
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
+    # Démarrage : migrations (ou simple vérification de la révision)
+    prepare_database(engine, settings.DB_STARTUP_MODE)
+    price_oracle.on_refresh(ProductPricing.on_rates_refreshed)
+    price_oracle.start()
+    await manager.start()
+    message_writer.start()
+    outbox_worker.start()
+    confirmation_poller.start()
+    transfer_indexer.start()
+    popularity_refresher.start()
+    view_counter.start()
     yield
-    # Arrêt (si besoin)
+    # Arrêt
+    await view_counter.stop()  # writes the views still buffered
+    await popularity_refresher.stop()
+    await transfer_indexer.stop()
+    await confirmation_poller.stop()
+    await outbox_worker.stop()
+    await message_writer.stop()
+    await manager.stop()
+    await fcm_client.aclose()
+    await bscscan_client.aclose()
+    await bsc_rpc_client.aclose()
+    await price_oracle.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -48,18 +81,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-DB-Query-Count", "X-DB-Time-Ms", "X-DB-N-Plus-One"],
 )
 
+if settings.SQL_INSTRUMENTATION:
+    instrument(engine)
+    instrument(async_engine.sync_engine)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"Incoming request: {request.method} {request.url}")
-    try:
-        response = await call_next(request)
+    with track_queries() as stats:
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            raise
+
+    if not settings.SQL_INSTRUMENTATION:
         logger.info(f"Response status: {response.status_code}")
         return response
-    except Exception as e:
-        logger.error(f"Request failed: {e}")
-        raise
+
+    db_time_ms = stats.total_time * 1000
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{db_time_ms:.1f}"
+    logger.info(
+        f"Response status: {response.status_code} "
+        f"queries={stats.count} db_time={db_time_ms:.1f}ms slowest={stats.slowest_time * 1000:.1f}ms"
+    )
+    if stats.slowest_time * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({stats.slowest_time * 1000:.1f}ms) on {request.url.path}: {stats.slowest_statement}")
+    repeated = stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD)
+    if repeated:
+        response.headers["X-DB-N-Plus-One"] = str(repeated[0][1])
+        for shape, count in repeated:
+            logger.warning(f"Suspected N+1 on {request.method} {request.url.path}: {count}x {shape}")
+    return response
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Login burst: fail fast rather than queueing behind every other request
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many authentication requests, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -3,4 +3,9 @@ from .product import Product
 from .order import Order, OrderStatus, PaymentMethod
 from .message import Message
 from .favorite import Favorite
-from .crypto import CryptoWallet, CryptoTransaction
+from .crypto import CryptoWallet, CryptoTransaction, ChainCheckpoint
+from .conversation import Conversation
+from .notification import NotificationOutbox
+from .product_view import ProductViewDaily
+from .popularity import PopularityState
+from .task_lease import TaskLease
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.db.session import Base
+
+
+class Conversation(Base):
+    """
+    One row per chat thread: a pair of users, optionally about an order.
+    Kept up to date by ChatService when messages are created or read.
+    """
+    __tablename__ = "conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Participants, stored in a canonical order (user_a_id < user_b_id)
+    user_a_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_b_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    order_key = Column(Integer, nullable=False, default=0)  # order_id or 0, NULLs are never equal in a unique key
+
+    # Last message of the thread
+    last_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
+    last_message_content = Column(String, nullable=True)
+    last_sender_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    last_message_at = Column(DateTime, nullable=False)
+
+    # Messages not read yet by each participant
+    unread_a = Column(Integer, nullable=False, default=0)
+    unread_b = Column(Integer, nullable=False, default=0)
+
+    user_a = relationship("User", foreign_keys=[user_a_id])
+    user_b = relationship("User", foreign_keys=[user_b_id])
+
+    __table_args__ = (
+        UniqueConstraint('user_a_id', 'user_b_id', 'order_key', name='unique_conversation_thread'),
+        # A user's threads, most recent activity first
+        Index('ix_conversations_user_a_last_message_at_id', 'user_a_id', 'last_message_at', 'id'),
+        Index('ix_conversations_user_b_last_message_at_id', 'user_b_id', 'last_message_at', 'id'),
+    )
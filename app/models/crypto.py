@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Index
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -41,6 +41,8 @@ class CryptoTransaction(Base):
     tx_hash = Column(String(100), unique=True, index=True, nullable=True)
     block_number = Column(Integer, nullable=True)
     confirmations = Column(Integer, default=0)
+    # Chain head at /payment/init: transfers in this block or older do not pay it
+    start_block = Column(Integer, nullable=True)
     
     # Status
     status = Column(String(20), default="pending")  # pending, confirming, confirmed, failed
@@ -48,3 +50,21 @@ class CryptoTransaction(Base):
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     confirmed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination of /crypto/transactions
+        Index('ix_crypto_transactions_created_at_id', 'created_at', 'id'),
+        # Open payments scanned by the confirmation poller
+        Index('ix_crypto_transactions_status_id', 'status', 'id'),
+    )
+
+
+class ChainCheckpoint(Base):
+    """Last block scanned by a chain indexer"""
+    __tablename__ = "chain_checkpoints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)  # e.g. bsc:usdt-transfers
+    block_number = Column(Integer, nullable=False)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
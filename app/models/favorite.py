@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -14,6 +14,8 @@ class Favorite(Base):
     # Unique constraint: user can only favorite a product once
     __table_args__ = (
         UniqueConstraint('user_id', 'product_id', name='unique_user_product_favorite'),
+        # A user's favorites, newest first
+        Index('ix_favorites_user_created_at_id', 'user_id', 'created_at', 'id'),
     )
     
     # Relationships
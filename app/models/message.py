@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.session import Base
@@ -19,3 +19,10 @@ class Message(Base):
     sender = relationship("User", foreign_keys=[sender_id], backref="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], backref="received_messages")
     order = relationship("Order", back_populates="messages")
+
+    # Keyset pagination of order threads and of a user's messages
+    __table_args__ = (
+        Index('ix_messages_order_created_at_id', 'order_id', 'created_at', 'id'),
+        Index('ix_messages_sender_created_at_id', 'sender_id', 'created_at', 'id'),
+        Index('ix_messages_receiver_created_at_id', 'receiver_id', 'created_at', 'id'),
+    )
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+
+class NotificationOutbox(Base):
+    """
+    Push notifications waiting to be sent. Rows are added in the same
+    transaction as the change they announce and drained by the outbox worker.
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)  # recipient
+    kind = Column(String(50), nullable=False)  # order_created, order_paid, new_message...
+
+    title = Column(String, nullable=False)
+    body = Column(String, nullable=False)
+    data = Column(JSON, nullable=True)
+
+    # Coalescing: later notifications with the same key fold into this pending row
+    collapse_key = Column(String(100), nullable=True)
+    coalesced_count = Column(Integer, default=1, server_default="1", nullable=False)
+
+    # Delivery
+    status = Column(String(20), default="pending", nullable=False)  # pending, sent, skipped, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The worker's queue: due pending rows
+        Index('ix_notification_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+        UniqueConstraint('collapse_key', name='uq_notification_outbox_collapse_key'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -66,3 +66,9 @@ class Order(Base):
     seller = relationship("User", foreign_keys=[seller_id], backref="sales")
     product = relationship("Product", backref="orders")
     messages = relationship("Message", back_populates="order", cascade="all, delete-orphan")
+
+    # Keyset pagination of purchases / sales
+    __table_args__ = (
+        Index('ix_orders_buyer_created_at_id', 'buyer_id', 'created_at', 'id'),
+        Index('ix_orders_seller_created_at_id', 'seller_id', 'created_at', 'id'),
+    )
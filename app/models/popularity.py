@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime
+from app.db.session import Base
+
+
+class PopularityState(Base):
+    """
+    Single row: scale of Product.popularity. Scores are forward-decayed
+    relative to `epoch`, which every bulk rebuild moves forward.
+    """
+    __tablename__ = "popularity_state"
+
+    id = Column(Integer, primary_key=True)
+    epoch = Column(DateTime, nullable=False)  # UTC
+    rebuilt_at = Column(DateTime, nullable=True)  # UTC, last bulk rebuild by any worker
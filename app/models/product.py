@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
@@ -10,7 +10,10 @@ class Product(Base):
     title = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Float, nullable=False)
-    currency = Column(String, default="TON") # TON, USD, etc.
+    currency = Column(String, default="TON") # TON, USD, etc. (upper case)
+    price_base = Column(Float, nullable=True)  # price in USD, maintained by ProductPricing
+    popularity = Column(Float, default=0, server_default="0", nullable=False)  # maintained by PopularityService
+    view_count = Column(Integer, default=0, server_default="0", nullable=False)  # flushed by the ViewCounter
     
     # Stockage des URLs d'images sous forme de liste JSON
     images = Column(JSON, default=[]) 
@@ -22,3 +25,14 @@ class Product(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Keyset pagination: one index per sort order of read_products
+    __table_args__ = (
+        Index('ix_products_created_at_id', 'created_at', 'id'),
+        Index('ix_products_price_base_id', 'price_base', 'id'),
+        # Price range within a category
+        Index('ix_products_category_price_base_id', 'category', 'price_base', 'id'),
+        Index('ix_products_popularity_id', 'popularity', 'id'),
+        # price_base recompute of one currency
+        Index('ix_products_currency', 'currency'),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, UniqueConstraint
+from app.db.session import Base
+
+
+class ProductViewDaily(Base):
+    """
+    Views of a product per day (UTC), for analytics and trending lists.
+    Written in batches by the ViewCounter, never per request.
+    """
+    __tablename__ = "product_view_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    views = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # One row per product and day; also serves a product's history
+        UniqueConstraint('product_id', 'day', name='uq_product_view_daily_product_day'),
+    )
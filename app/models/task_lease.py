@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from app.db.session import Base
+
+
+class TaskLease(Base):
+    """Which worker runs a background task that must not run in several at once"""
+    __tablename__ = "task_leases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)  # e.g. payment-confirmations
+    holder = Column(String(64), nullable=True)  # worker id
+    expires_at = Column(DateTime, nullable=False)  # UTC
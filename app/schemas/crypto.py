@@ -41,6 +41,7 @@ class TransactionCreate(TransactionBase):
 
 class TransactionVerify(BaseModel):
     tx_hash: str
+    transaction_id: Optional[int] = None  # pending payment from /payment/init to attach the hash to
 
 
 class TransactionResponse(TransactionBase):
@@ -49,6 +50,7 @@ class TransactionResponse(TransactionBase):
     from_address: Optional[str] = None
     to_address: str
     tx_hash: Optional[str] = None
+    block_number: Optional[int] = None
     status: str
     confirmations: int
     created_at: datetime
@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class FavoriteBase(BaseModel):
@@ -20,3 +20,9 @@ class FavoriteWithProduct(FavoriteResponse):
     product_title: Optional[str] = None
     product_price: Optional[float] = None
     product_image: Optional[str] = None
+
+class FavoriteCheckRequest(BaseModel):
+    product_ids: List[int] = Field(..., max_length=200)
+
+class FavoriteCheckResponse(BaseModel):
+    favorite_ids: List[int]
@@ -34,3 +34,36 @@ class Message(MessageInDB):
 class MessageWithSender(Message):
     sender_name: Optional[str] = None
     receiver_name: Optional[str] = None
+
+
+class ConversationSummary(BaseModel):
+    """One chat thread as seen by the current user"""
+    id: int
+    order_id: Optional[int] = None
+    other_user_id: int
+    other_user_name: Optional[str] = None
+    last_message_id: Optional[int] = None
+    last_message: Optional[str] = None
+    last_sender_id: Optional[int] = None
+    last_message_at: datetime
+    unread_count: int
+
+
+class UserPresence(BaseModel):
+    user_id: int
+    online: bool
+    devices: int = 0
+    last_seen: Optional[datetime] = None
+
+
+class ReadWatermark(BaseModel):
+    up_to_message_id: int
+
+
+class ReadReceipt(BaseModel):
+    conversation_id: Optional[int] = None
+    reader_id: int
+    order_id: Optional[int] = None
+    up_to_message_id: int
+    marked_read: int
+    unread_count: int
@@ -1,6 +1,6 @@
 from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from .user import User as UserSchema
 
 class ProductBase(BaseModel):
@@ -11,6 +11,12 @@ class ProductBase(BaseModel):
     category: Optional[str] = None
     images: List[str] = []
 
+    @field_validator("currency")
+    @classmethod
+    def normalize_currency(cls, value: str) -> str:
+        # Stored upper case, so ProductPricing matches it with a plain equality
+        return value.strip().upper()
+
 class ProductCreate(ProductBase):
     pass
 
@@ -22,6 +28,8 @@ class ProductUpdate(ProductBase):
 class Product(ProductBase):
     id: int
     seller_id: int
+    price_base: Optional[float] = None  # price in USD, None if the currency has no rate
+    view_count: int = 0  # lags by up to VIEW_FLUSH_INTERVAL seconds
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -0,0 +1,178 @@
+"""
+Pub/sub brokers used to fan chat events out across workers.
+
+Each worker subscribes to the channels of the users connected to it (plus a
+broadcast channel) and delivers what it receives to its local sockets only.
+`send_personal_message` publishes to the receiver's channel, so a message
+reaches the receiver whichever worker holds the socket.
+
+Backends (CHAT_BROKER): "memory" (single process, tests) or "redis" (REDIS_URL).
+
+Brokers also answer `is_online(user_id)` for every worker: the Redis broker
+keeps one sorted set per connected user (member: worker id, score: lease
+expiry), refreshed by the WebSocket heartbeat, so presence entries of a
+crashed worker expire after WS_IDLE_TIMEOUT seconds.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_CHANNEL = "chat:broadcast"
+
+# handler(user_id or None for broadcast, payload)
+DeliveryHandler = Callable[[Optional[int], str], Awaitable[None]]
+
+
+def user_channel(user_id: int) -> str:
+    return f"chat:user:{user_id}"
+
+
+def presence_key(user_id: int) -> str:
+    return f"chat:online:{user_id}"
+
+
+class MemoryBroker:
+    """In-process broker: publishing delivers directly to this worker's handler"""
+
+    def __init__(self):
+        self._handler: Optional[DeliveryHandler] = None
+        self._subscribed: Set[int] = set()
+
+    async def start(self, handler: DeliveryHandler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        self._handler = None
+        self._subscribed.clear()
+
+    async def subscribe(self, user_id: int) -> None:
+        self._subscribed.add(user_id)
+
+    async def unsubscribe(self, user_id: int) -> None:
+        self._subscribed.discard(user_id)
+
+    async def publish(self, user_id: int, payload: str) -> None:
+        if self._handler is not None and user_id in self._subscribed:
+            await self._handler(user_id, payload)
+
+    async def publish_broadcast(self, payload: str) -> None:
+        if self._handler is not None:
+            await self._handler(None, payload)
+
+    async def is_online(self, user_id: int) -> bool:
+        return user_id in self._subscribed
+
+    async def refresh_presence(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """Redis pub/sub: one channel per connected user, one reader task per worker"""
+
+    RECONNECT_DELAY = 1.0  # seconds
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # optional dependency
+
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._handler: Optional[DeliveryHandler] = None
+        self._reader: Optional[asyncio.Task] = None
+        self.worker_id = uuid.uuid4().hex
+        self._subscribed: Set[int] = set()
+
+    async def start(self, handler: DeliveryHandler) -> None:
+        self._handler = handler
+        # Always subscribed to something, so the reader has a connection to poll
+        await self._pubsub.subscribe(BROADCAST_CHANNEL)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._subscribed:
+            try:
+                pipe = self._client.pipeline(transaction=False)
+                for user_id in self._subscribed:
+                    pipe.zrem(presence_key(user_id), self.worker_id)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Chat presence cleanup failed: {e}")
+            self._subscribed.clear()
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+    async def subscribe(self, user_id: int) -> None:
+        await self._pubsub.subscribe(user_channel(user_id))
+        self._subscribed.add(user_id)
+        await self._mark_online([user_id])
+
+    async def unsubscribe(self, user_id: int) -> None:
+        await self._pubsub.unsubscribe(user_channel(user_id))
+        self._subscribed.discard(user_id)
+        await self._client.zrem(presence_key(user_id), self.worker_id)
+
+    async def is_online(self, user_id: int) -> bool:
+        """Connected to any worker whose presence lease has not expired"""
+        return await self._client.zcount(presence_key(user_id), time.time(), "+inf") > 0
+
+    async def refresh_presence(self) -> None:
+        """Renew the presence lease of every user connected to this worker"""
+        if self._subscribed:
+            await self._mark_online(list(self._subscribed))
+
+    async def _mark_online(self, user_ids: Iterable[int]) -> None:
+        lease = max(settings.WS_IDLE_TIMEOUT, 2 * settings.WS_PING_INTERVAL)
+        pipe = self._client.pipeline(transaction=False)
+        for user_id in user_ids:
+            key = presence_key(user_id)
+            pipe.zadd(key, {self.worker_id: time.time() + lease})
+            pipe.expire(key, int(lease) + 1)
+        await pipe.execute()
+
+    async def publish(self, user_id: int, payload: str) -> None:
+        await self._client.publish(user_channel(user_id), payload)
+
+    async def publish_broadcast(self, payload: str) -> None:
+        await self._client.publish(BROADCAST_CHANNEL, payload)
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The pubsub reconnects and resubscribes on the next read
+                logger.error(f"Chat broker read failed: {e}")
+                await asyncio.sleep(self.RECONNECT_DELAY)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"].decode()
+            payload = message["data"].decode()
+            user_id = None if channel == BROADCAST_CHANNEL else int(channel.rsplit(":", 1)[1])
+            try:
+                await self._handler(user_id, payload)
+            except Exception as e:
+                logger.error(f"Chat delivery failed for {channel}: {e}")
+
+
+def create_broker():
+    if settings.CHAT_BROKER == "redis":
+        try:
+            return RedisBroker(settings.REDIS_URL)
+        except ImportError:
+            logger.warning("redis package not installed, using in-memory chat broker")
+    return MemoryBroker()
@@ -0,0 +1,202 @@
+"""
+Chat persistence and conversation summaries.
+
+Every message written through `ChatService.create_message` also updates its
+thread's row in `conversations` (last message, unread counters) in the same
+transaction, so listing conversations never scans the message history.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.models.user import User
+from app.services.connection_manager import manager
+from app.services.notification_outbox import NotificationOutboxService
+from app.services.notification_service import NotificationTypes
+
+PREVIEW_LENGTH = 200
+
+
+def thread_key(user_id: int, other_id: int, order_id: Optional[int]) -> Tuple[int, int, int]:
+    """(user_a_id, user_b_id, order_key) of the thread between two users"""
+    user_a_id, user_b_id = sorted((user_id, other_id))
+    return user_a_id, user_b_id, order_id or 0
+
+
+def _thread_filter(message: Message):
+    user_a_id, user_b_id, order_key = thread_key(message.sender_id, message.receiver_id, message.order_id)
+    return (
+        Conversation.user_a_id == user_a_id,
+        Conversation.user_b_id == user_b_id,
+        Conversation.order_key == order_key,
+    )
+
+
+def _unread_column(message: Message):
+    """Counter of the receiver of `message`"""
+    user_a_id, _, _ = thread_key(message.sender_id, message.receiver_id, message.order_id)
+    return Conversation.unread_a if message.receiver_id == user_a_id else Conversation.unread_b
+
+
+class ChatService:
+    """Messages and their conversation summaries"""
+
+    @staticmethod
+    def create_message(
+        db: Session,
+        sender_id: int,
+        receiver_id: int,
+        content: str,
+        order_id: Optional[int] = None,
+    ) -> Message:
+        """Add a message and update its thread summary. The caller commits."""
+        message = Message(
+            sender_id=sender_id,
+            receiver_id=receiver_id,
+            order_id=order_id,
+            content=content,
+            created_at=datetime.utcnow(),
+            is_read=False
+        )
+        db.add(message)
+        db.flush()
+        ChatService.record_message(db, message)
+        ChatService.notify_receivers(db, [message])
+        return message
+
+    @staticmethod
+    def record_message(db: Session, message: Message) -> None:
+        """Make `message` the last one of its thread and count it as unread for the receiver."""
+        ChatService.record_messages(db, [message])
+
+    @staticmethod
+    def record_messages(db: Session, messages: Sequence[Message]) -> None:
+        """`record_message` for a batch: one statement per thread, not per message."""
+        threads: Dict[Tuple[int, int, int], List[Message]] = defaultdict(list)
+        for message in messages:
+            threads[thread_key(message.sender_id, message.receiver_id, message.order_id)].append(message)
+        for (user_a_id, user_b_id, order_key), thread_messages in threads.items():
+            last = max(thread_messages, key=lambda m: m.id)
+            unread_a = sum(1 for m in thread_messages if not m.is_read and m.receiver_id == user_a_id)
+            unread_b = sum(1 for m in thread_messages if not m.is_read and m.receiver_id == user_b_id)
+            ChatService._record_thread(db, (user_a_id, user_b_id, order_key), last, unread_a, unread_b)
+
+    @staticmethod
+    def notify_receivers(db: Session, messages: Sequence[Message]) -> None:
+        """
+        Queue new_message pushes in the current transaction: one per receiver and
+        thread per CHAT_PUSH_WINDOW ("N new messages"), none for receivers
+        connected to this worker's WebSocket. Receivers connected to another
+        worker are skipped by the outbox worker when the push is due.
+        """
+        bursts: Dict[Tuple[int, int, int], List[Message]] = defaultdict(list)
+        for message in messages:
+            if not manager.is_online(message.receiver_id):
+                bursts[(message.receiver_id, message.sender_id, message.order_id or 0)].append(message)
+        if not bursts:
+            return
+        sender_ids = {sender_id for _, sender_id, _ in bursts}
+        names = dict(db.query(User.id, User.full_name).filter(User.id.in_(sender_ids)).all())
+        for (receiver_id, sender_id, order_key), burst in bursts.items():
+            NotificationOutboxService.enqueue_coalesced(
+                db, receiver_id, "new_message",
+                NotificationTypes.new_message(names.get(sender_id) or "", burst[0].order_id),
+                collapse_key=f"chat:{receiver_id}:{sender_id}:{order_key}",
+                window=settings.CHAT_PUSH_WINDOW,
+                count=len(burst),
+            )
+
+    @staticmethod
+    def _record_thread(db: Session, key: Tuple[int, int, int], last: Message, unread_a: int, unread_b: int) -> None:
+        user_a_id, user_b_id, order_key = key
+        last_values = {
+            "last_message_id": last.id,
+            "last_message_content": last.content[:PREVIEW_LENGTH],
+            "last_sender_id": last.sender_id,
+            "last_message_at": last.created_at,
+        }
+        stmt = update(Conversation).where(
+            Conversation.user_a_id == user_a_id,
+            Conversation.user_b_id == user_b_id,
+            Conversation.order_key == order_key,
+        ).values(
+            unread_a=Conversation.unread_a + unread_a,
+            unread_b=Conversation.unread_b + unread_b,
+            **last_values,
+        )
+        if db.execute(stmt).rowcount:
+            return
+
+        # First message of the thread
+        conversation = Conversation(
+            user_a_id=user_a_id,
+            user_b_id=user_b_id,
+            order_id=last.order_id,
+            order_key=order_key,
+            unread_a=unread_a,
+            unread_b=unread_b,
+            **last_values,
+        )
+        try:
+            with db.begin_nested():
+                db.add(conversation)
+        except IntegrityError:
+            # Created concurrently by the other participant
+            db.execute(stmt)
+
+    @staticmethod
+    def record_read_change(db: Session, message: Message, was_read: bool) -> None:
+        """Adjust the receiver's unread counter after `message.is_read` changed."""
+        if bool(was_read) == bool(message.is_read):
+            return
+        unread = _unread_column(message)
+        if message.is_read:
+            new_value = unread - 1
+            filters = (*_thread_filter(message), unread > 0)
+        else:
+            new_value = unread + 1
+            filters = _thread_filter(message)
+        db.execute(update(Conversation).where(*filters).values({unread.key: new_value}))
+
+    @staticmethod
+    def mark_read_up_to(
+        db: Session,
+        reader_id: int,
+        other_id: int,
+        order_id: Optional[int],
+        up_to_message_id: int,
+    ) -> Tuple[int, int]:
+        """
+        Mark every message of the thread received by `reader_id` with an id up to
+        `up_to_message_id` as read, in one UPDATE. The caller commits.
+        Returns (messages marked read, unread messages left for the reader).
+        """
+        order_filter = Message.order_id == order_id if order_id else Message.order_id.is_(None)
+        marked = db.execute(
+            update(Message).where(
+                Message.receiver_id == reader_id,
+                Message.sender_id == other_id,
+                order_filter,
+                Message.id <= up_to_message_id,
+                Message.is_read.isnot(True),
+            ).values(is_read=True)
+        ).rowcount
+
+        user_a_id, user_b_id, order_key = thread_key(reader_id, other_id, order_id)
+        unread = Conversation.unread_a if reader_id == user_a_id else Conversation.unread_b
+        result = db.execute(
+            update(Conversation).where(
+                Conversation.user_a_id == user_a_id,
+                Conversation.user_b_id == user_b_id,
+                Conversation.order_key == order_key,
+            ).values({unread.key: case((unread > marked, unread - marked), else_=0)})
+            .returning(unread)
+        ).first()
+        return marked, result[0] if result else 0
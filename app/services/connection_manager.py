@@ -0,0 +1,286 @@
+"""
+WebSocket connections of this worker.
+
+Messages are published through the chat broker and delivered by whichever
+worker holds the receiver's socket. Delivery never awaits a socket: frames
+go into a bounded per-connection queue drained by that connection's writer
+task, so a slow client only delays itself.
+
+A user may be connected from several devices at once. Clients that opt in to
+application heartbeats (`?heartbeat=true`, or by sending a ping/pong frame)
+get a {"type": "ping"} every WS_PING_INTERVAL seconds and are closed and
+dropped after WS_IDLE_TIMEOUT seconds without sending anything. Other
+clients never see these frames; dead sockets are detected by the server's
+protocol-level pings (uvicorn --ws-ping-interval / --ws-ping-timeout).
+Likewise, {"type": "read"} receipts only go to clients that opted in
+(`?receipts=true`, or by tagging a message with a client_id): older clients
+show every frame on the socket as a chat message.
+
+Presence (online / last seen) is answered from this registry, so with
+several workers it only knows about the sockets held by this one;
+`is_online_anywhere()` also asks the broker, which shares presence across
+workers (CHAT_BROKER=redis).
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from fastapi import WebSocket
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.services.chat_broker import create_broker
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+# Close code sent to a consumer too slow to keep up ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Close code sent to a connection that stopped answering pings
+IDLE_CLOSE_CODE = 1001
+
+PING_FRAME = json.dumps({"type": "ping"})
+PONG_FRAME = json.dumps({"type": "pong"})
+# Start of every frame built by read_frame()
+READ_FRAME_PREFIX = '{"type": "read"'
+
+
+def read_frame(receipt: dict) -> str:
+    """Read receipt frame, delivered only to connections with `receipts`"""
+    return json.dumps({"type": "read", **receipt})
+
+
+class Connection:
+    """One socket with its outbound queue and writer task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: int,
+        queue_size: int,
+        overflow_policy: str,
+        send_timeout: float,
+        heartbeats: bool = False,
+        receipts: bool = False,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.heartbeats = heartbeats  # client answers application pings
+        self.receipts = receipts  # client understands read receipt frames
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.slow = False  # closed for not keeping up
+        self.closed = False
+        self._writer: Optional[asyncio.Task] = None
+        self._closing: Optional[asyncio.Task] = None
+        self.last_activity = time.monotonic()
+
+    def touch(self) -> None:
+        """Record that the client sent something (message, ping or pong)"""
+        self.last_activity = time.monotonic()
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, message: str) -> bool:
+        """Queue a frame without waiting. False if the frame was not queued."""
+        if self.closed:
+            return False
+        if self.queue.full():
+            if self.overflow_policy == DISCONNECT:
+                logger.warning(f"Disconnecting slow WebSocket consumer (user {self.user_id})")
+                self.slow = True
+                self.closed = True
+                self._closing = asyncio.create_task(self._close_socket(SLOW_CONSUMER_CLOSE_CODE))
+                return False
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+        return True
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"WebSocket send timed out (user {self.user_id})")
+            self.slow = True
+            await self.close(SLOW_CONSUMER_CLOSE_CODE)
+        except Exception as e:
+            logger.error(f"WebSocket send failed (user {self.user_id}): {e}")
+            self.closed = True
+
+    async def close(self, code: int = 1000) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        await self._close_socket(code)
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            # A half-open socket may never complete the close handshake
+            await asyncio.wait_for(self.websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass  # already gone
+
+    def stop(self) -> None:
+        """Stop the writer (frames still queued are dropped)"""
+        self.closed = True
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
+
+class ConnectionManager:
+    def __init__(self, broker=None):
+        self.active_connections: Dict[int, Set[Connection]] = {}
+        self.broker = broker if broker is not None else create_broker()
+        self.dropped_frames = 0  # from connections already closed
+        self.slow_disconnects = 0
+        self.idle_disconnects = 0
+        # user id -> time of the last disconnect, for users no longer connected here
+        self.last_seen = TTLCache(maxsize=settings.PRESENCE_MAX_USERS, ttl=settings.PRESENCE_TTL)
+        self._heartbeat = PeriodicTask("WebSocket heartbeat", settings.WS_PING_INTERVAL, self.heartbeat)
+
+    async def start(self) -> None:
+        await self.broker.start(self._deliver)
+        self._heartbeat.start()
+
+    async def stop(self) -> None:
+        await self._heartbeat.stop()
+        for connection in self._connections():
+            connection.stop()
+        self.active_connections.clear()
+        await self.broker.stop()
+
+    def _connections(self) -> List[Connection]:
+        return [connection for connections in self.active_connections.values() for connection in connections]
+
+    async def connect(
+        self, websocket: WebSocket, user_id: int, heartbeats: bool = False, receipts: bool = False
+    ) -> Connection:
+        await websocket.accept()
+        connection = Connection(
+            websocket, user_id,
+            queue_size=settings.WS_SEND_QUEUE_SIZE,
+            overflow_policy=settings.WS_OVERFLOW_POLICY,
+            send_timeout=settings.WS_SEND_TIMEOUT,
+            heartbeats=heartbeats,
+            receipts=receipts,
+        )
+        connection.start()
+        connections = self.active_connections.setdefault(user_id, set())
+        connections.add(connection)
+        if len(connections) == 1:
+            await self.broker.subscribe(user_id)
+        return connection
+
+    async def disconnect(self, connection: Connection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None and connection in connections:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+                self.last_seen.set(connection.user_id, datetime.utcnow())
+                await self.broker.unsubscribe(connection.user_id)
+        self._release(connection)
+
+    def _release(self, connection: Connection) -> None:
+        connection.stop()
+        self.dropped_frames += connection.dropped
+        self.slow_disconnects += connection.slow
+        connection.dropped = 0
+        connection.slow = False
+
+    async def send_personal_message(self, message: str, user_id: int):
+        try:
+            await self.broker.publish(user_id, message)
+        except Exception as e:
+            logger.error(f"Chat publish failed for user {user_id}: {e}")
+
+    async def broadcast(self, message: str):
+        await self.broker.publish_broadcast(message)
+
+    async def _deliver(self, user_id: Optional[int], message: str) -> None:
+        """Called by the broker: queue the frame on the sockets held by this worker"""
+        if user_id is None:
+            targets = self._connections()
+        else:
+            targets = list(self.active_connections.get(user_id, ()))
+        if message.startswith(READ_FRAME_PREFIX):
+            targets = [connection for connection in targets if connection.receipts]
+        for connection in targets:
+            connection.enqueue(message)
+
+    async def heartbeat(self) -> None:
+        """Ping the heartbeat connections, drop the idle ones and the closed ones"""
+        try:
+            await self.broker.refresh_presence()
+        except Exception as e:
+            logger.warning(f"Chat presence refresh failed: {e}")
+        deadline = time.monotonic() - settings.WS_IDLE_TIMEOUT
+        stale = []
+        for connection in self._connections():
+            if connection.closed or (connection.heartbeats and connection.last_activity < deadline):
+                stale.append(connection)
+            elif connection.heartbeats:
+                connection.enqueue(PING_FRAME)
+        for connection in stale:
+            if not connection.closed:
+                logger.info(f"Reaping idle WebSocket (user {connection.user_id})")
+                self.idle_disconnects += 1
+            await self.disconnect(connection)
+        # Half-open sockets may take up to the send timeout to close: close them together
+        await asyncio.gather(*(connection._close_socket(IDLE_CLOSE_CODE) for connection in stale))
+
+    def is_online(self, user_id: int) -> bool:
+        """Connected to this worker"""
+        return bool(self.active_connections.get(user_id))
+
+    async def is_online_anywhere(self, user_id: int) -> bool:
+        """Connected to any worker; False when the broker cannot tell"""
+        if self.is_online(user_id):
+            return True
+        try:
+            return await self.broker.is_online(user_id)
+        except Exception as e:
+            logger.warning(f"Chat presence lookup failed for user {user_id}: {e}")
+            return False
+
+    def presence(self, user_id: int) -> dict:
+        online = self.is_online(user_id)
+        return {
+            "user_id": user_id,
+            "online": online,
+            "devices": len(self.active_connections.get(user_id, ())),
+            "last_seen": None if online else self.last_seen.get(user_id),
+        }
+
+    def stats(self) -> dict:
+        """Queue depth and dropped frames of this worker"""
+        connections = self._connections()
+        depths = [connection.queue.qsize() for connection in connections]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(depths),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_size": settings.WS_SEND_QUEUE_SIZE,
+            "overflow_policy": settings.WS_OVERFLOW_POLICY,
+            "dropped_frames": self.dropped_frames + sum(connection.dropped for connection in connections),
+            "slow_disconnects": self.slow_disconnects + sum(connection.slow for connection in connections),
+            "idle_disconnects": self.idle_disconnects,
+        }
+
+
+manager = ConnectionManager()
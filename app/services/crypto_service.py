@@ -1,15 +1,189 @@
+"""
+Blockchain payment helpers.
+
+Explorer calls go through one long-lived pooled HTTP client, created on
+first use and closed by the app lifespan, with at most
+BSCSCAN_MAX_CONCURRENCY requests in flight and at most BSCSCAN_RATE_LIMIT
+requests started per second (BscScan rate-limits per key). Raw chain
+queries (eth_getLogs for the transfer indexer) go to a BSC JSON-RPC node
+through `BscRpcClient`, several calls per HTTP request.
+"""
+import asyncio
+import logging
 import httpx
-from typing import Optional, Dict, Any
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.price_oracle import price_oracle
+
+logger = logging.getLogger(__name__)
+
+# BEP-20 USDT on BNB Smart Chain (18 decimals)
+USDT_BSC_CONTRACT = "0x55d398326f99059fF775485246999027B3197955"
+USDT_BSC_DECIMALS = 18
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def to_units(amount: float) -> int:
+    """USDT amount -> integer token units, as in Transfer logs"""
+    return int((Decimal(str(amount)) * 10 ** USDT_BSC_DECIMALS).to_integral_value())
+
+
+def address_topic(address: str) -> str:
+    """Address as a 32-byte log topic"""
+    return "0x" + address.lower()[2:].rjust(64, "0")
+
+
+def topic_address(topic: str) -> str:
+    return "0x" + topic[-40:].lower()
+
+
+def decode_transfers(logs: List[dict]) -> List[Dict[str, Any]]:
+    """Token Transfer events of a receipt: token contract, sender, recipient, amount in units"""
+    transfers = []
+    for log in logs:
+        topics = log.get("topics") or []
+        if len(topics) < 3 or topics[0].lower() != TRANSFER_TOPIC or log.get("removed"):
+            continue
+        transfers.append({
+            "token": (log.get("address") or "").lower(),
+            "from": topic_address(topics[1]),
+            "to": topic_address(topics[2]),
+            "units": int(log.get("data") or "0x0", 16),
+        })
+    return transfers
+
+
+class BscScanClient:
+    """Pooled client for the BscScan (Etherscan-compatible) API"""
+
+    def __init__(self, api_url: str, api_key: Optional[str], timeout: float, max_concurrency: int, rate_limit: float = 0):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit  # requests per second, 0 for none
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._next_slot = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, module: str, action: str, **params) -> dict:
+        """One API call; returns the decoded JSON body"""
+        client = self.client
+        async with self._semaphore:
+            await self._throttle()
+            response = await client.get(
+                self.api_url,
+                params={"module": module, "action": action, **params, "apikey": self.api_key or ""},
+            )
+        response.raise_for_status()
+        return response.json()
+
+    async def _throttle(self) -> None:
+        """Space request starts 1/rate_limit seconds apart"""
+        if not self.rate_limit:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 1 / self.rate_limit
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+bscscan_client = BscScanClient(
+    settings.BSCSCAN_API_URL,
+    settings.BSCSCAN_API_KEY,
+    timeout=settings.BSCSCAN_TIMEOUT,
+    max_concurrency=settings.BSCSCAN_MAX_CONCURRENCY,
+    rate_limit=settings.BSCSCAN_RATE_LIMIT,
+)
+
+class BscRpcClient:
+    """Pooled JSON-RPC client for a BSC node"""
+
+    def __init__(self, url: str, timeout: float, max_concurrency: int):
+        self.url = url
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def batch(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        """Send (method, params) calls as one JSON-RPC batch; results in call order"""
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        client = self.client
+        async with self._semaphore:
+            response = await client.post(self.url, json=payload)
+        response.raise_for_status()
+        replies = {reply.get("id"): reply for reply in response.json()}
+        results = []
+        for i, (method, _) in enumerate(calls):
+            reply = replies.get(i) or {"error": "no reply"}
+            if "error" in reply:
+                raise RuntimeError(f"{method} failed: {reply['error']}")
+            results.append(reply["result"])
+        return results
+
+    async def call(self, method: str, params: list) -> Any:
+        return (await self.batch([(method, params)]))[0]
+
+
+bsc_rpc_client = BscRpcClient(
+    settings.BSC_RPC_URL,
+    timeout=settings.BSC_RPC_TIMEOUT,
+    max_concurrency=settings.BSC_RPC_MAX_CONCURRENCY,
+)
+
+# tx hash -> final verification result (reverted, or deep enough to be confirmed)
+_verified = TTLCache(maxsize=settings.BSC_VERIFY_CACHE_MAX, ttl=settings.BSC_VERIFY_CACHE_TTL)
+
 
 class CryptoService:
     """Service for verifying blockchain transactions"""
     
-    # BSCScan API for Binance Smart Chain
-    BSCSCAN_API = "https://api.bscscan.com/api"
-    BSCSCAN_API_KEY = ""  # Optional: add for higher rate limits
-    
     # Etherscan API for Ethereum
     ETHERSCAN_API = "https://api.etherscan.io/api"
     
@@ -39,91 +213,90 @@ class CryptoService:
     ) -> str:
         """Generate Trust Wallet deep link"""
         # Trust Wallet uses WalletConnect or simple links
-        # For BSC USDT: token contract is 0x55d398326f99059fF775485246999027B3197955
         if network == "bsc" and currency == "USDT":
-            token_contract = "0x55d398326f99059fF775485246999027B3197955"
-            return f"trust://send?asset=c20000714_t{token_contract}&address={to_address}&amount={amount}"
+            return f"trust://send?asset=c20000714_t{USDT_BSC_CONTRACT}&address={to_address}&amount={amount}"
         return f"trust://send?address={to_address}&amount={amount}"
     
     @staticmethod
-    async def verify_bsc_transaction(tx_hash: str) -> Dict[str, Any]:
+    async def verify_bsc_transaction(tx_hash: str, head: Optional[int] = None) -> Dict[str, Any]:
         """
         Verify a transaction on Binance Smart Chain
         
+        One eth_getTransactionReceipt call. Final results are cached by tx
+        hash, so a settled transaction never goes back to the explorer: a
+        reverted receipt, or one with BSC_CONFIRMATIONS blocks up to `head`.
+        A receipt with fewer confirmations is fetched again on the next call,
+        as a reorg may still drop it.
+        
         Returns:
-            Dict with: success, confirmations, amount, from_address, to_address, status
+            Dict with: success, status, from_address, to_address, block_number,
+            transfers (token Transfer events, see decode_transfers)
         """
+        key = tx_hash.lower()
+        cached = _verified.get(key)
+        if cached is not None:
+            return dict(cached)
+        
         try:
-            async with httpx.AsyncClient() as client:
-                # Get transaction details
-                response = await client.get(
-                    CryptoService.BSCSCAN_API,
-                    params={
-                        "module": "transaction",
-                        "action": "gettxreceiptstatus",
-                        "txhash": tx_hash,
-                        "apikey": CryptoService.BSCSCAN_API_KEY or ""
-                    },
-                    timeout=10.0
-                )
-                data = response.json()
-                
-                if data.get("status") == "1":
-                    # Transaction found and successful
-                    receipt_status = data.get("result", {}).get("status", "0")
-                    
-                    # Get full transaction details
-                    tx_response = await client.get(
-                        CryptoService.BSCSCAN_API,
-                        params={
-                            "module": "proxy",
-                            "action": "eth_getTransactionByHash",
-                            "txhash": tx_hash,
-                            "apikey": CryptoService.BSCSCAN_API_KEY or ""
-                        },
-                        timeout=10.0
-                    )
-                    tx_data = tx_response.json()
-                    result = tx_data.get("result", {})
-                    
-                    return {
-                        "success": True,
-                        "status": "confirmed" if receipt_status == "1" else "failed",
-                        "from_address": result.get("from", ""),
-                        "to_address": result.get("to", ""),
-                        "block_number": int(result.get("blockNumber", "0x0"), 16) if result.get("blockNumber") else 0,
-                        "confirmations": 12 if receipt_status == "1" else 0,  # BSC is fast
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "status": "pending",
-                        "error": "Transaction not found or pending"
-                    }
-                    
+            data = await bscscan_client.get("proxy", "eth_getTransactionReceipt", txhash=tx_hash)
         except Exception as e:
+            logger.warning(f"BscScan lookup failed for {tx_hash}: {e}")
             return {
                 "success": False,
                 "status": "error",
                 "error": str(e)
             }
+        
+        receipt = data.get("result")
+        if data.get("status") == "0" or isinstance(receipt, str):
+            # API error instead of a JSON-RPC reply, e.g. "Max rate limit reached"
+            logger.warning(f"BscScan lookup failed for {tx_hash}: {data.get('message')} {receipt}")
+            return {
+                "success": False,
+                "status": "error",
+                "error": str(receipt or data.get("message"))
+            }
+        
+        if not isinstance(receipt, dict) or not receipt.get("blockNumber"):
+            # Unknown hash or not mined yet: not cached
+            return {
+                "success": False,
+                "status": "pending",
+                "error": "Transaction not found or pending"
+            }
+        
+        succeeded = receipt.get("status") == "0x1"
+        verified = {
+            "success": True,
+            "status": "confirmed" if succeeded else "failed",
+            "from_address": receipt.get("from", ""),
+            # For a token payment this is the token contract, not the recipient
+            "to_address": receipt.get("to", ""),
+            "block_number": int(receipt["blockNumber"], 16),
+            "transfers": decode_transfers(receipt.get("logs") or []) if succeeded else [],
+        }
+        final = not succeeded or (
+            head is not None and head - verified["block_number"] + 1 >= settings.BSC_CONFIRMATIONS
+        )
+        if final:
+            _verified.set(key, verified)
+        return dict(verified)
+    
+    @staticmethod
+    async def get_bsc_block_number() -> int:
+        """Number of the latest BSC block"""
+        data = await bscscan_client.get("proxy", "eth_blockNumber")
+        return int(data["result"], 16)
     
     @staticmethod
     async def get_crypto_price(currency: str = "USDT") -> float:
         """
         Get current price of cryptocurrency in USD
-        For stablecoins like USDT, this is approximately 1.0
+        For stablecoins like USDT, this is 1.0
         """
-        if currency in ["USDT", "USDC", "DAI", "BUSD"]:
-            return 1.0  # Stablecoins are pegged to USD
-        
-        # For other cryptos, would need to call CoinGecko or similar API
-        return 0.0
+        return await price_oracle.get_usd(currency)
     
     @staticmethod
-    def usd_to_crypto(usd_amount: float, currency: str = "USDT") -> float:
+    async def usd_to_crypto(usd_amount: float, currency: str = "USDT") -> float:
         """Convert USD amount to crypto amount"""
-        if currency in ["USDT", "USDC", "DAI", "BUSD"]:
-            return usd_amount  # 1:1 for stablecoins
-        # Add more conversions as needed
-        return usd_amount
+        return await price_oracle.convert(usd_amount, "USD", currency)
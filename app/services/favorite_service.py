@@ -0,0 +1,49 @@
+"""
+Per-user cache of favorited product ids.
+
+Backs the heart icons on product cards: loaded with one query per user, then
+kept up to date by add_favorite / remove_favorite. Each worker has its own
+copy, so a change made through another worker shows up after FAVORITES_CACHE_TTL.
+"""
+from typing import Iterable, List, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.favorite import Favorite
+
+
+class FavoriteService:
+    """Favorite-set lookups backed by an in-process TTL cache"""
+
+    _cache = TTLCache(maxsize=settings.FAVORITES_CACHE_MAX_USERS, ttl=settings.FAVORITES_CACHE_TTL)
+
+    @staticmethod
+    def get_favorite_ids(db: Session, user_id: int) -> Set[int]:
+        favorite_ids = FavoriteService._cache.get(user_id)
+        if favorite_ids is None:
+            rows = db.query(Favorite.product_id).filter(Favorite.user_id == user_id).all()
+            favorite_ids = {product_id for (product_id,) in rows}
+            FavoriteService._cache.set(user_id, favorite_ids)
+        return favorite_ids
+
+    @staticmethod
+    def filter_favorites(db: Session, user_id: int, product_ids: Iterable[int]) -> List[int]:
+        """The subset of `product_ids` the user has favorited, in request order."""
+        favorite_ids = FavoriteService.get_favorite_ids(db, user_id)
+        return [product_id for product_id in dict.fromkeys(product_ids) if product_id in favorite_ids]
+
+    # Updated in place so the entry keeps its original expiry: changes made
+    # through other workers are still picked up after the TTL.
+    @staticmethod
+    def added(user_id: int, product_id: int) -> None:
+        favorite_ids = FavoriteService._cache.get(user_id)
+        if favorite_ids is not None:
+            favorite_ids.add(product_id)
+
+    @staticmethod
+    def removed(user_id: int, product_id: int) -> None:
+        favorite_ids = FavoriteService._cache.get(user_id)
+        if favorite_ids is not None:
+            favorite_ids.discard(product_id)
@@ -0,0 +1,102 @@
+"""
+Google ID token verification with a cached copy of Google's signing certificates.
+
+The certificates are fetched once and reused until their Cache-Control max-age
+expires, so a Google sign-in normally costs only a local signature check (run
+off the event loop). A token signed with an unknown key id triggers one
+refresh shared by all concurrent callers.
+"""
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+from typing import Dict, Optional
+
+import httpx
+from google.auth import jwt as google_jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleCertsUnavailable(Exception):
+    """Google's certificates could not be fetched and none are cached"""
+
+
+class GoogleTokenVerifier:
+    """Verifies Google ID tokens against a cached certificate set"""
+
+    DEFAULT_MAX_AGE = 300  # seconds, when the response has no Cache-Control
+    MIN_FORCED_REFRESH_INTERVAL = 30  # seconds between refreshes caused by unknown key ids
+
+    def __init__(self, certs_url: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.certs_url = certs_url
+        self.transport = transport
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return bool(self._certs) and time.monotonic() < self._expires_at
+
+    async def _fetch(self) -> None:
+        async with httpx.AsyncClient(transport=self.transport, timeout=5.0) as client:
+            response = await client.get(self.certs_url)
+            response.raise_for_status()
+        match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else self.DEFAULT_MAX_AGE
+        self._certs = response.json()
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + max_age
+
+    async def get_certs(self, kid: Optional[str] = None) -> Dict[str, str]:
+        """Cached certificates, refreshed when expired or when `kid` is unknown."""
+        if self._is_fresh() and (kid is None or kid in self._certs):
+            return self._certs
+        # Single flight: concurrent callers wait for the same refresh
+        async with self._lock:
+            stale = not self._is_fresh()
+            unknown_kid = kid is not None and kid not in self._certs
+            recently_fetched = time.monotonic() - self._fetched_at < self.MIN_FORCED_REFRESH_INTERVAL
+            if stale or (unknown_kid and not recently_fetched):
+                try:
+                    await self._fetch()
+                except (httpx.HTTPError, ValueError) as e:
+                    if not self._certs:
+                        raise GoogleCertsUnavailable(str(e))
+                    logger.warning(f"Google certs refresh failed, using cached certs: {e}")
+        return self._certs
+
+    @staticmethod
+    def _unverified_kid(token: str) -> Optional[str]:
+        try:
+            segment = token.split(".")[0]
+            header = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+            return header.get("kid")
+        except (ValueError, IndexError):
+            raise ValueError("Malformed token")
+
+    async def verify(self, token: str, audience: Optional[str]) -> dict:
+        """
+        Verify signature, expiry, audience and issuer of a Google ID token.
+        Raises ValueError for invalid tokens (same contract as google.oauth2.id_token).
+        """
+        kid = self._unverified_kid(token)
+        certs = await self.get_certs(kid)
+        if kid is not None and kid not in certs:
+            raise ValueError(f"Unknown key id {kid}")
+        idinfo = await asyncio.to_thread(google_jwt.decode, token, certs=certs, audience=audience)
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer {idinfo.get('iss')}")
+        return idinfo
+
+
+google_verifier = GoogleTokenVerifier(settings.GOOGLE_CERTS_URL)
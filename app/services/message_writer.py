@@ -0,0 +1,146 @@
+"""
+Group commit for chat messages received over WebSocket.
+
+Connections submit messages to one queue; a single writer task takes up to
+CHAT_BATCH_MAX_SIZE of them (waiting at most CHAT_BATCH_MAX_DELAY for a batch
+to fill), inserts them with one multi-row INSERT ... RETURNING id, updates
+the conversation summaries, queues the push notifications and commits once.
+Each `submit()` returns when its message is durably written. A pooled
+connection is only checked out while a batch is being written.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.message import Message
+from app.services.chat_service import ChatService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingMessage:
+    sender_id: int
+    receiver_id: int
+    content: str
+    order_id: Optional[int] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    def values(self) -> dict:
+        return {
+            "sender_id": self.sender_id,
+            "receiver_id": self.receiver_id,
+            "order_id": self.order_id,
+            "content": self.content,
+            "created_at": self.created_at,
+            "is_read": False,
+        }
+
+
+class MessageWriter:
+    """Batches message inserts from all connections into short transactions"""
+
+    def __init__(self, max_batch_size: int, max_delay: float):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.messages = 0
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="chat message writer")
+
+    async def stop(self) -> None:
+        """Write what is already queued, then stop."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, sender_id: int, receiver_id: int, content: str, order_id: Optional[int] = None) -> Message:
+        """Queue a message and wait until it is committed. Returns it with its id."""
+        if self._task is None:
+            raise RuntimeError("Message writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((PendingMessage(sender_id, receiver_id, content, order_id), future))
+        return await future
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[PendingMessage, asyncio.Future]]) -> None:
+        pending = [item for item, _ in batch]
+        try:
+            messages = await asyncio.to_thread(self._write_batch, pending)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Chat message write failed: {e}")
+                _, future = batch[0]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            # Isolate the bad message(s): write the batch one message at a time
+            logger.warning(f"Chat batch of {len(batch)} failed ({e}), retrying one by one")
+            for item in batch:
+                await self._write([item])
+            return
+        self.batches += 1
+        self.messages += len(messages)
+        for (_, future), message in zip(batch, messages):
+            if not future.done():
+                future.set_result(message)
+
+    @staticmethod
+    def _write_batch(pending: List[PendingMessage]) -> List[Message]:
+        """Runs in a worker thread with its own short-lived session."""
+        db = SessionLocal()
+        try:
+            rows = [item.values() for item in pending]
+            ids = db.scalars(
+                insert(Message).returning(Message.id, sort_by_parameter_order=True), rows
+            ).all()
+            # Transient copies for the summaries and the caller: no refresh needed
+            messages = [Message(id=message_id, **row) for message_id, row in zip(ids, rows)]
+            ChatService.record_messages(db, messages)
+            ChatService.notify_receivers(db, messages)
+            db.commit()
+            return messages
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+message_writer = MessageWriter(settings.CHAT_BATCH_MAX_SIZE, settings.CHAT_BATCH_MAX_DELAY)
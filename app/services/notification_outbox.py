@@ -0,0 +1,270 @@
+"""
+Durable push-notification outbox.
+
+`NotificationOutboxService.enqueue()` adds a row in the caller's transaction,
+so a notification exists if and only if the order/message change committed,
+and requests never wait on FCM. The `OutboxWorker` (started by the app
+lifespan) claims due rows, sends them through the pooled FCM client and
+records the outcome:
+
+- accepted by FCM                 -> sent
+- recipient has no device token   -> skipped
+- chat push, receiver connected   -> skipped
+- token unregistered/invalid      -> failed, and User.fcm_token is cleared
+- other errors                    -> retried with exponential backoff, then
+                                     failed (dead letter) after OUTBOX_MAX_ATTEMPTS
+
+Claimed rows are leased (next_attempt_at pushed OUTBOX_LEASE seconds ahead),
+so several workers can share the table and rows of a crashed worker are
+picked up again.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.principal_cache import principal_cache
+from app.core.tasks import PeriodicTask
+from app.db.session import SessionLocal
+from app.models.notification import NotificationOutbox
+from app.models.user import User
+from app.services.connection_manager import manager
+from app.services.notification_service import NotificationService, UNREGISTERED_ERRORS, fcm_client
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class NotificationOutboxService:
+    """Queue notifications in the current transaction"""
+
+    @staticmethod
+    def enqueue(db: Session, user_id: int, kind: str, notification: dict) -> NotificationOutbox:
+        """
+        Queue a `NotificationTypes` template for `user_id`. Works with Session and
+        AsyncSession alike; the caller commits.
+        """
+        row = NotificationOutboxService._build(user_id, kind, notification)
+        db.add(row)
+        return row
+
+    @staticmethod
+    def _build(user_id: int, kind: str, notification: dict, delay: float = 0) -> NotificationOutbox:
+        return NotificationOutbox(
+            user_id=user_id,
+            kind=kind,
+            title=notification["title"],
+            body=notification["body"],
+            data=notification.get("data"),
+            status=PENDING,
+            attempts=0,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+        )
+
+    @staticmethod
+    def enqueue_coalesced(
+        db: Session,
+        user_id: int,
+        kind: str,
+        notification: dict,
+        collapse_key: str,
+        window: float,
+        count: int = 1,
+    ) -> None:
+        """
+        Queue a notification sent `window` seconds from now, or fold it into the
+        pending one with the same `collapse_key` (its count grows by `count`).
+        Sync Session only; the caller commits.
+        """
+        stmt = update(NotificationOutbox).where(
+            NotificationOutbox.collapse_key == collapse_key,
+            NotificationOutbox.status == PENDING,
+        ).values(coalesced_count=NotificationOutbox.coalesced_count + count)
+        if db.execute(stmt).rowcount:
+            return
+        row = NotificationOutboxService._build(user_id, kind, notification, delay=window)
+        row.collapse_key = collapse_key
+        row.coalesced_count = count
+        try:
+            with db.begin_nested():
+                db.add(row)
+        except IntegrityError:
+            # Queued concurrently by another request
+            db.execute(stmt)
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds before retry number `attempts` (exponential, capped, with jitter)"""
+    delay = min(settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), settings.OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class OutboxWorker:
+    """Drains the outbox in batches"""
+
+    def __init__(self):
+        self._task = PeriodicTask("Notification outbox", settings.OUTBOX_POLL_INTERVAL, self.drain)
+        self._cleanup = PeriodicTask("Notification outbox cleanup", 3600, self.cleanup)
+        self._warned_unconfigured = False
+
+    def start(self) -> None:
+        self._task.start()
+        self._cleanup.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+        await self._cleanup.stop()
+
+    async def drain(self) -> None:
+        """Send due notifications until fewer than a full batch is left."""
+        if not fcm_client.server_key:
+            if not self._warned_unconfigured:
+                logger.warning("FCM_SERVER_KEY not configured, notifications stay in the outbox")
+                self._warned_unconfigured = True
+            return
+        while True:
+            batch = await asyncio.to_thread(self._claim, settings.OUTBOX_BATCH_SIZE)
+            if not batch:
+                return
+            errors = await asyncio.gather(*(self._try_send(row) for row in batch))
+            await asyncio.to_thread(self._record, batch, errors)
+            if len(batch) < settings.OUTBOX_BATCH_SIZE:
+                return
+
+    @staticmethod
+    async def _try_send(row: dict) -> Optional[str]:
+        """_send, with an unexpected exception recorded as a retryable error of this row only"""
+        try:
+            return await OutboxWorker._send(row)
+        except Exception as e:
+            logger.warning(f"Notification {row['id']} send raised: {e!r}")
+            return f"{type(e).__name__}: {e}"
+
+    @staticmethod
+    async def _send(row: dict) -> Optional[str]:
+        if not row["token"]:
+            return None
+        if row["kind"] == "new_message" and await manager.is_online_anywhere(row["user_id"]):
+            # Connected on the WebSocket (to any worker): the messages were already delivered there
+            row["skip_reason"] = "Receiver online"
+            return None
+        body = f"{row['count']} new messages" if row["count"] > 1 else row["body"]
+        message = NotificationService.build_message(row["title"], body, row["data"])
+        errors = await fcm_client.send_batch([row["token"]], message)
+        return errors[0]
+
+    @staticmethod
+    def _claim(limit: int) -> List[dict]:
+        """Lease up to `limit` due rows (SKIP LOCKED where supported)."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                NotificationOutbox.id, NotificationOutbox.user_id, NotificationOutbox.title,
+                NotificationOutbox.body, NotificationOutbox.data, NotificationOutbox.attempts,
+                NotificationOutbox.kind, NotificationOutbox.coalesced_count, User.fcm_token,
+            ).join(User, User.id == NotificationOutbox.user_id).filter(
+                NotificationOutbox.status == PENDING,
+                NotificationOutbox.next_attempt_at <= now,
+            ).order_by(NotificationOutbox.next_attempt_at).limit(limit).with_for_update(
+                skip_locked=True, of=NotificationOutbox
+            ).all()
+            if rows:
+                db.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_([row.id for row in rows]))
+                    # Later notifications with the same key start a new row
+                    .values(next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE), collapse_key=None)
+                )
+            db.commit()
+            return [
+                {
+                    "id": row.id, "user_id": row.user_id, "title": row.title, "body": row.body,
+                    "data": row.data, "attempts": row.attempts, "token": row.fcm_token,
+                    "kind": row.kind, "count": row.coalesced_count,
+                }
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _record(batch: List[dict], errors: List[Optional[str]]) -> None:
+        """Store every outcome of a batch in one executemany UPDATE."""
+        now = datetime.utcnow()
+        updates = []
+        invalid_tokens = {}
+
+        def outcome(row, status, attempts, error=None, next_attempt_at=now):
+            # Same keys for every row so the UPDATE is batched (executemany)
+            updates.append({
+                "id": row["id"], "status": status, "attempts": attempts, "last_error": error,
+                "sent_at": now if status == SENT else None, "next_attempt_at": next_attempt_at,
+            })
+
+        for row, error in zip(batch, errors):
+            attempts = row["attempts"] + 1
+            if not row["token"]:
+                outcome(row, SKIPPED, row["attempts"], "No FCM token")
+            elif row.get("skip_reason"):
+                outcome(row, SKIPPED, row["attempts"], row["skip_reason"])
+            elif error is None:
+                outcome(row, SENT, attempts)
+            elif error in UNREGISTERED_ERRORS:
+                invalid_tokens[row["token"]] = row["user_id"]
+                outcome(row, FAILED, attempts, error)
+            elif attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                logger.error(f"Notification {row['id']} dead-lettered after {attempts} attempts: {error}")
+                outcome(row, FAILED, attempts, error)
+            else:
+                outcome(row, PENDING, attempts, error, now + timedelta(seconds=backoff_delay(attempts)))
+
+        db = SessionLocal()
+        try:
+            db.execute(update(NotificationOutbox), updates)
+            if invalid_tokens:
+                db.execute(
+                    update(User)
+                    .where(User.fcm_token.in_(list(invalid_tokens)))
+                    .values(fcm_token=None)
+                )
+            db.commit()
+        finally:
+            db.close()
+        for user_id in set(invalid_tokens.values()):
+            principal_cache.invalidate(user_id)
+        if invalid_tokens:
+            logger.info(f"Cleared {len(invalid_tokens)} unregistered FCM token(s)")
+
+    async def cleanup(self) -> None:
+        """
+        Delete rows delivered or skipped more than OUTBOX_RETENTION_DAYS ago
+        (next_attempt_at holds the time of the final outcome). Failed rows are kept.
+        """
+        def run():
+            cutoff = datetime.utcnow() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+            db = SessionLocal()
+            try:
+                db.execute(
+                    delete(NotificationOutbox).where(
+                        NotificationOutbox.status.in_([SENT, SKIPPED]),
+                        NotificationOutbox.next_attempt_at < cutoff,
+                    )
+                )
+                db.commit()
+            finally:
+                db.close()
+        await asyncio.to_thread(run)
+
+
+outbox_worker = OutboxWorker()
@@ -1,22 +1,145 @@
 """
 Notification Service for E-Mobile
 Handles Firebase Cloud Messaging (FCM) push notifications
+
+All sends go through one long-lived pooled HTTP client (HTTP/2 when the h2
+package is installed), created on first use and closed by the app lifespan.
+Multi-device sends use FCM's `registration_ids` batches (up to 1000 tokens
+per request), several batches in flight at once.
 """
-import os
-from typing import Optional, List
+import asyncio
+import logging
+from typing import Optional, List, Dict
 import httpx
 
+from app.core.config import settings
+
 # For production, use firebase-admin SDK
 # from firebase_admin import credentials, messaging, initialize_app
 
-# FCM Server Key (set in environment)
-FCM_SERVER_KEY = os.getenv("FCM_SERVER_KEY", "")
-FCM_API_URL = "https://fcm.googleapis.com/fcm/send"
+logger = logging.getLogger(__name__)
+
+# Per-token errors meaning the token will never work again
+UNREGISTERED_ERRORS = {"NotRegistered", "InvalidRegistration"}
+# Per-token errors worth retrying later
+RETRYABLE_ERRORS = {"Unavailable", "InternalServerError", "DeviceMessageRateExceeded", "Timeout"}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  optional, enables HTTP/2
+        return True
+    except ImportError:
+        return False
+
+
+class FCMClient:
+    """Pooled client for the FCM HTTP API"""
+
+    def __init__(self, api_url: str, server_key: Optional[str], timeout: float, max_concurrency: int, batch_size: int):
+        self.api_url = api_url
+        self.server_key = server_key
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=_http2_available(),
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                headers={
+                    "Authorization": f"key={self.server_key}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send_batch(self, tokens: List[str], message: dict) -> List[Optional[str]]:
+        """
+        Send one request for up to `batch_size` tokens.
+        Returns one entry per token: None if accepted, else the FCM error name.
+        """
+        payload = dict(message)
+        if len(tokens) == 1:
+            payload["to"] = tokens[0]
+        else:
+            payload["registration_ids"] = tokens
+        try:
+            response = await self.client.post(self.api_url, json=payload)
+        except httpx.TimeoutException:
+            return ["Timeout"] * len(tokens)
+        except httpx.HTTPError as e:
+            logger.error(f"FCM request failed: {e}")
+            return ["Unavailable"] * len(tokens)
+        if response.status_code >= 500:
+            return ["Unavailable"] * len(tokens)
+        if response.status_code != 200:
+            logger.error(f"FCM rejected the request: {response.status_code} {response.text[:200]}")
+            return [f"HTTP{response.status_code}"] * len(tokens)
+        try:
+            results = response.json().get("results") or []
+        except ValueError:
+            logger.error(f"FCM returned an unreadable body: {response.text[:200]}")
+            return ["Unavailable"] * len(tokens)
+        errors = [result.get("error") for result in results]
+        # Missing entries (should not happen) count as failures to retry
+        return errors + ["Unavailable"] * (len(tokens) - len(errors))
+
+    async def send_multicast(self, tokens: List[str], message: dict) -> Dict[str, Optional[str]]:
+        """Send to every token, `max_concurrency` batches at a time. Returns token -> error (or None)."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [tokens[i:i + self.batch_size] for i in range(0, len(tokens), self.batch_size)]
+
+        async def send(batch: List[str]) -> List[Optional[str]]:
+            async with semaphore:
+                return await self.send_batch(batch, message)
+
+        outcomes = await asyncio.gather(*(send(batch) for batch in batches))
+        return {
+            token: error
+            for batch, errors in zip(batches, outcomes)
+            for token, error in zip(batch, errors)
+        }
+
+
+fcm_client = FCMClient(
+    settings.FCM_API_URL,
+    settings.FCM_SERVER_KEY,
+    timeout=settings.FCM_TIMEOUT,
+    max_concurrency=settings.FCM_MAX_CONCURRENCY,
+    batch_size=settings.FCM_BATCH_SIZE,
+)
 
 
 class NotificationService:
     """Service for sending push notifications via FCM"""
     
+    @staticmethod
+    def build_message(title: str, body: str, data: Optional[dict] = None) -> dict:
+        message = {
+            "notification": {
+                "title": title,
+                "body": body,
+                "sound": "default",
+                "click_action": "OPEN_APP"
+            }
+        }
+        if data:
+            message["data"] = data
+        return message
+    
     @staticmethod
     async def send_to_device(
         token: str,
@@ -36,39 +159,12 @@ class NotificationService:
         Returns:
             bool: Success status
         """
-        if not FCM_SERVER_KEY:
-            print("Warning: FCM_SERVER_KEY not configured")
+        if not fcm_client.server_key:
+            logger.warning("FCM_SERVER_KEY not configured")
             return False
-            
-        headers = {
-            "Authorization": f"key={FCM_SERVER_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "to": token,
-            "notification": {
-                "title": title,
-                "body": body,
-                "sound": "default",
-                "click_action": "OPEN_APP"
-            }
-        }
         
-        if data:
-            payload["data"] = data
-            
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    FCM_API_URL,
-                    headers=headers,
-                    json=payload
-                )
-                return response.status_code == 200
-        except Exception as e:
-            print(f"Error sending notification: {e}")
-            return False
+        errors = await fcm_client.send_batch([token], NotificationService.build_message(title, body, data))
+        return errors[0] is None
     
     @staticmethod
     async def send_to_multiple(
@@ -81,21 +177,24 @@ class NotificationService:
         Send notification to multiple devices
         
         Returns:
-            dict: Results with success/failure counts
+            dict: Results with success/failure counts, and the tokens FCM
+            reports as unregistered
         """
         if not tokens:
-            return {"success": 0, "failure": 0}
-            
-        results = {"success": 0, "failure": 0}
+            return {"success": 0, "failure": 0, "invalid_tokens": []}
+        if not fcm_client.server_key:
+            logger.warning("FCM_SERVER_KEY not configured")
+            return {"success": 0, "failure": len(tokens), "invalid_tokens": []}
         
-        for token in tokens:
-            success = await NotificationService.send_to_device(token, title, body, data)
-            if success:
-                results["success"] += 1
-            else:
-                results["failure"] += 1
-                
-        return results
+        outcome = await fcm_client.send_multicast(
+            list(dict.fromkeys(tokens)), NotificationService.build_message(title, body, data)
+        )
+        failures = [token for token, error in outcome.items() if error is not None]
+        return {
+            "success": len(outcome) - len(failures),
+            "failure": len(failures),
+            "invalid_tokens": [token for token in failures if outcome[token] in UNREGISTERED_ERRORS],
+        }
 
 
 # Predefined notification types
@@ -135,9 +234,9 @@ class NotificationTypes:
         }
     
     @staticmethod
-    def new_message(sender_name: str, order_id: int) -> dict:
+    def new_message(sender_name: str, order_id: Optional[int]) -> dict:
         return {
             "title": f"Message from {sender_name} 💬",
             "body": "You have a new message",
-            "data": {"type": "chat", "order_id": str(order_id)}
+            "data": {"type": "chat", "order_id": str(order_id) if order_id else ""}
         }
@@ -0,0 +1,240 @@
+"""
+Confirmation of crypto payments.
+
+Buyers attach a tx hash to their payment through /crypto/payment/verify. From
+then on the `ConfirmationPoller` (started by the app lifespan) checks every
+pending or confirming BSC transaction every PAYMENT_POLL_INTERVAL seconds.
+Only the worker holding the "payment-confirmations" task lease polls, so the
+BscScan key sees one poller's request rate however many workers run:
+batches of PAYMENT_POLL_BATCH_SIZE are looked up concurrently through the
+rate-limited BscScan client, and the results of a batch are written in one
+transaction:
+
+- not on chain yet                     -> unchanged
+- reverted, or no USDT Transfer event of exactly the payment's amount to its
+  to_address in the receipt            -> failed
+- mined, fewer than BSC_CONFIRMATIONS  -> confirming (confirmations, block_number)
+- mined, enough confirmations          -> confirmed; the order becomes PAID_ESCROW
+                                          and the seller is notified
+
+The receipt's Transfer logs are what proves the payment: for a token
+transfer the transaction's own `to` is the token contract, not the seller.
+
+Only rows still pending or confirming are written: a stale poll or verify
+never overwrites a transaction already settled (e.g. by the transfer
+indexer). Clients poll the transaction row instead of the explorer.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, case, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.db.session import SessionLocal
+from app.models.crypto import CryptoTransaction
+from app.models.order import Order, OrderStatus
+from app.services.crypto_service import USDT_BSC_CONTRACT, CryptoService, to_units
+from app.services.notification_outbox import NotificationOutboxService
+from app.services.notification_service import NotificationTypes
+from app.services.task_lease import LeaseService
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+CONFIRMING = "confirming"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+
+OPEN_STATUSES = (PENDING, CONFIRMING)
+
+LEASE_NAME = "payment-confirmations"
+
+transactions = CryptoTransaction.__table__
+UPDATE_COLUMNS = ("tx_hash", "status", "from_address", "block_number", "confirmations", "confirmed_at")
+# Plain Core statement, run with a list of parameters (executemany)
+UPDATE_OPEN_TRANSACTION = (
+    update(transactions)
+    .where(transactions.c.id == bindparam("tid"), transactions.c.status.in_(OPEN_STATUSES))
+    .values({column: bindparam(f"new_{column}") for column in UPDATE_COLUMNS})
+)
+
+
+class PaymentConfirmationService:
+    """Turn explorer results into transaction and order updates"""
+
+    @staticmethod
+    def paying_transfer(transaction: dict, transfers: List[dict]) -> Optional[dict]:
+        """The Transfer event of `transfers` that pays `transaction` in full, if any"""
+        if transaction["currency"] != "USDT":
+            return None
+        token = USDT_BSC_CONTRACT.lower()
+        to_address = transaction["to_address"].lower()
+        units = to_units(transaction["amount"])
+        for transfer in transfers:
+            if transfer["token"] == token and transfer["to"] == to_address and transfer["units"] == units:
+                return transfer
+        return None
+
+    @staticmethod
+    async def check(transactions: List[dict]) -> List[dict]:
+        """
+        Look up `transactions` ({"id", "order_id", "tx_hash", "to_address",
+        "amount", "currency"}) on chain, all at once. Returns the updates for
+        `apply` (transactions not mined yet are left out).
+        """
+        # Head first: a receipt is only cached once it is final at this head
+        head = await CryptoService.get_bsc_block_number()
+        results = await asyncio.gather(
+            *(CryptoService.verify_bsc_transaction(tx["tx_hash"], head) for tx in transactions)
+        )
+        now = datetime.utcnow()
+        updates = []
+        for tx, result in zip(transactions, results):
+            if not result["success"]:
+                continue
+            confirmations = max(head - result["block_number"] + 1, 0)
+            transfer = None
+            if result["status"] == "failed":
+                status = FAILED
+                confirmations = 0
+            else:
+                transfer = PaymentConfirmationService.paying_transfer(tx, result["transfers"])
+                if transfer is None:
+                    logger.warning(
+                        f"Transaction {tx['id']}: {tx['tx_hash']} does not pay "
+                        f"{tx['amount']} {tx['currency']} to {tx['to_address']}"
+                    )
+                    status = FAILED
+                    confirmations = 0
+                elif confirmations >= settings.BSC_CONFIRMATIONS:
+                    status = CONFIRMED
+                else:
+                    status = CONFIRMING
+            updates.append({
+                "id": tx["id"],
+                "order_id": tx["order_id"],
+                "tx_hash": tx["tx_hash"],
+                "status": status,
+                "from_address": transfer["from"] if transfer else result["from_address"],
+                "block_number": result["block_number"],
+                "confirmations": confirmations,
+                "confirmed_at": now if status == CONFIRMED else None,
+            })
+        return updates
+
+    @staticmethod
+    def apply(db: Session, updates: List[dict]) -> None:
+        """
+        Write `check` results in bulk: one executemany UPDATE for the transactions
+        still open, one UPDATE for the orders they pay. The caller commits.
+        """
+        if not updates:
+            return
+        db.execute(
+            UPDATE_OPEN_TRANSACTION,
+            [
+                {"tid": item["id"], **{f"new_{column}": item[column] for column in UPDATE_COLUMNS}}
+                for item in updates
+            ],
+        )
+        confirmed = {item["id"]: item for item in updates if item["status"] == CONFIRMED}
+        if not confirmed:
+            return
+        # Orders of the transactions this update confirmed (not a row settled otherwise meanwhile)
+        rows = db.execute(
+            select(CryptoTransaction.id, CryptoTransaction.tx_hash).where(
+                CryptoTransaction.id.in_(list(confirmed)), CryptoTransaction.status == CONFIRMED
+            )
+        ).all()
+        paid: Dict[int, str] = {
+            confirmed[tid]["order_id"]: tx_hash for tid, tx_hash in rows if tx_hash == confirmed[tid]["tx_hash"]
+        }
+        if not paid:
+            return
+        # Only orders still awaiting payment: a payment confirmed twice notifies once
+        orders = db.execute(
+            update(Order)
+            .where(Order.id.in_(list(paid)), Order.status == OrderStatus.CREATED)
+            .values(
+                status=OrderStatus.PAID_ESCROW,
+                paid_at=datetime.utcnow(),
+                transaction_hash=case(paid, value=Order.id),
+            )
+            .returning(Order.id, Order.seller_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        for order_id, seller_id in orders:
+            NotificationOutboxService.enqueue(db, seller_id, "order_paid", NotificationTypes.order_paid(order_id))
+
+
+class ConfirmationPoller:
+    """Confirms open BSC payments in the background"""
+
+    def __init__(self):
+        self._task = PeriodicTask("Payment confirmations", settings.PAYMENT_POLL_INTERVAL, self.run)
+        # Outlives a poll cycle, so the holder keeps it; a dead worker's lease expires
+        self.lease_ttl = max(3 * settings.PAYMENT_POLL_INTERVAL, 60)
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+        try:
+            await asyncio.to_thread(LeaseService.release, LEASE_NAME)
+        except Exception as e:
+            logger.warning(f"Payment poll lease not released: {e}")
+
+    async def run(self) -> None:
+        """Poll if this worker holds the lease."""
+        if await asyncio.to_thread(LeaseService.acquire, LEASE_NAME, self.lease_ttl):
+            await self.poll()
+
+    async def poll(self) -> None:
+        """Check every open transaction, one batch at a time."""
+        after_id = 0
+        while True:
+            batch = await asyncio.to_thread(self._open_transactions, after_id, settings.PAYMENT_POLL_BATCH_SIZE)
+            if not batch:
+                return
+            updates = await PaymentConfirmationService.check(batch)
+            if updates:
+                await asyncio.to_thread(self._apply, updates)
+                settled = sum(1 for item in updates if item["status"] in (CONFIRMED, FAILED))
+                logger.info(f"Payment poll: {len(updates)} transaction(s) updated, {settled} settled")
+            if len(batch) < settings.PAYMENT_POLL_BATCH_SIZE:
+                return
+            after_id = batch[-1]["id"]
+
+    @staticmethod
+    def _open_transactions(after_id: int, limit: int) -> List[dict]:
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                CryptoTransaction.id, CryptoTransaction.order_id, CryptoTransaction.tx_hash,
+                CryptoTransaction.to_address, CryptoTransaction.amount, CryptoTransaction.currency,
+            ).filter(
+                CryptoTransaction.status.in_(OPEN_STATUSES),
+                CryptoTransaction.tx_hash.isnot(None),
+                CryptoTransaction.network == "bsc",
+                CryptoTransaction.id > after_id,
+            ).order_by(CryptoTransaction.id).limit(limit).all()
+            return [dict(row._mapping) for row in rows]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _apply(updates: List[dict]) -> None:
+        db = SessionLocal()
+        try:
+            PaymentConfirmationService.apply(db, updates)
+            db.commit()
+        finally:
+            db.close()
+
+
+confirmation_poller = ConfirmationPoller()
@@ -0,0 +1,205 @@
+"""
+Product popularity for sort_by=popular.
+
+`Product.popularity` is a time-decayed score of orders, favorites and views
+(weights POPULARITY_ORDER_WEIGHT, POPULARITY_FAVORITE_WEIGHT and
+POPULARITY_VIEW_WEIGHT; an event loses half its weight every
+POPULARITY_HALF_LIFE_DAYS). It uses forward decay: an event at time t adds
+weight * 2^((t - epoch) / half-life) instead of decaying every stored score
+as time passes. All scores share the same scale factor, so ordering by the
+column at any moment equals ordering by the decayed score, and a new event
+is one `popularity = popularity + x` UPDATE.
+
+Events are added in the transaction that records them (order created,
+favorite added, batch of views flushed by the ViewCounter). Every
+POPULARITY_REFRESH_INTERVAL seconds the scores are rebuilt in bulk from the
+last POPULARITY_WINDOW_DAYS of events, which also drops removed favorites
+and cancelled orders. The rebuild moves the epoch to the start of the
+window, so weights stay below 2^(window / half-life) instead of growing
+without bound. Listings page over the (popularity, id) index.
+
+The epoch lives in the `PopularityState` row. Increments read it with a
+shared row lock and the rebuild holds an exclusive one, so no increment is
+computed on the old epoch or overwritten by a rebuild that did not see its
+event (on SQLite the rebuild takes the database write lock before reading
+the events). Workers take turns: a worker skips its rebuild if another one
+ran it less than half an interval ago.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.db.session import SessionLocal
+from app.models.favorite import Favorite
+from app.models.order import Order, OrderStatus
+from app.models.popularity import PopularityState
+from app.models.product import Product
+from app.models.product_view import ProductViewDaily
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = 1
+# Epoch of a database without a rebuild yet (seeded by the migration)
+EPOCH = datetime(2026, 1, 1)
+
+
+def decay_weight(at: datetime, epoch: datetime) -> float:
+    """Multiplier of an event at `at` on the scale of `epoch` (grows by 2 every half-life)"""
+    half_life = settings.POPULARITY_HALF_LIFE_DAYS * 86400
+    return 2 ** ((at.replace(tzinfo=None) - epoch.replace(tzinfo=None)).total_seconds() / half_life)
+
+
+class PopularityService:
+    """Maintains Product.popularity"""
+
+    @staticmethod
+    def _state(db: Session, **lock) -> Row:
+        """(epoch, rebuilt_at), locked until the caller commits with `with_for_update(**lock)`"""
+        query = (
+            select(PopularityState.epoch, PopularityState.rebuilt_at)
+            .where(PopularityState.id == STATE_ID)
+            .with_for_update(**lock)
+        )
+        state = db.execute(query).first()
+        if state is None:
+            # Database created without the migrations: the first use inserts the row
+            try:
+                with db.begin_nested():
+                    db.add(PopularityState(id=STATE_ID, epoch=EPOCH))
+            except IntegrityError:
+                pass
+            state = db.execute(query).first()
+        return state
+
+    @staticmethod
+    def epoch(db: Session) -> datetime:
+        """Epoch of the stored scores, kept until the caller commits (no rebuild in between)"""
+        return PopularityService._state(db, read=True, key_share=True).epoch
+
+    @staticmethod
+    def record(db: Session, product_id: int, weight: float, at: datetime = None) -> None:
+        """Add one event to a product's score, in the caller's transaction"""
+        at = at or datetime.utcnow()
+        db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(popularity=Product.popularity + weight * decay_weight(at, PopularityService.epoch(db)))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def order_created(db: Session, product_id: int) -> None:
+        PopularityService.record(db, product_id, settings.POPULARITY_ORDER_WEIGHT)
+
+    @staticmethod
+    def favorite_added(db: Session, product_id: int) -> None:
+        PopularityService.record(db, product_id, settings.POPULARITY_FAVORITE_WEIGHT)
+
+    @staticmethod
+    def compute(db: Session, since: datetime, epoch: datetime) -> Dict[int, float]:
+        """Scores on the scale of `epoch` from the events since `since`, aggregated per product and day"""
+        scores: Dict[int, float] = defaultdict(float)
+        # (product, day, events that day, weight, filter)
+        sources = (
+            (Order.product_id, func.date(Order.created_at), func.count(), settings.POPULARITY_ORDER_WEIGHT,
+             and_(Order.created_at >= since, Order.status != OrderStatus.CANCELLED)),
+            (Favorite.product_id, func.date(Favorite.created_at), func.count(), settings.POPULARITY_FAVORITE_WEIGHT,
+             Favorite.created_at >= since),
+            (ProductViewDaily.product_id, ProductViewDaily.day, func.sum(ProductViewDaily.views),
+             settings.POPULARITY_VIEW_WEIGHT, ProductViewDaily.day >= since.date()),
+        )
+        for product_column, day, amount, weight, condition in sources:
+            rows = db.execute(
+                select(product_column, day, amount)
+                .join(Product, Product.id == product_column)  # no score for deleted products
+                .where(condition)
+                .group_by(product_column, day)
+            ).all()
+            for product_id, event_day, count in rows:
+                if product_id is None or event_day is None:
+                    continue
+                if isinstance(event_day, str):  # SQLite returns date() as text
+                    event_day = datetime.fromisoformat(event_day)
+                # Events of a day counted at its middle
+                at = datetime(event_day.year, event_day.month, event_day.day, 12)
+                scores[product_id] += weight * count * decay_weight(at, epoch)
+        return scores
+
+    @staticmethod
+    def rebuild(db: Session, min_interval: float = 0) -> Optional[int]:
+        """
+        Recompute every score in bulk, on a new epoch. Returns the number of
+        scored products, None if a rebuild ran less than `min_interval`
+        seconds ago. The caller commits.
+        """
+        # Exclusive lock: waits for the increments in flight, holds off new ones
+        state = PopularityService._state(db)
+        now = datetime.utcnow()
+        if state.rebuilt_at is not None and (now - state.rebuilt_at).total_seconds() < min_interval:
+            return None
+        since = now - timedelta(days=settings.POPULARITY_WINDOW_DAYS)
+        claimed = db.execute(
+            update(PopularityState)
+            .where(
+                PopularityState.id == STATE_ID,
+                PopularityState.rebuilt_at.is_(None) if state.rebuilt_at is None
+                else PopularityState.rebuilt_at == state.rebuilt_at,
+            )
+            .values(epoch=since, rebuilt_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            return None  # another worker got there first (SQLite ignores the row lock)
+        scores = PopularityService.compute(db, since, since)
+        db.execute(
+            update(Product)
+            .where(Product.popularity != 0)
+            .values(popularity=0)
+            .execution_options(synchronize_session=False)
+        )
+        if scores:
+            db.execute(
+                update(Product).execution_options(synchronize_session=False),
+                [{"id": product_id, "popularity": score} for product_id, score in scores.items()],
+            )
+        return len(scores)
+
+
+class PopularityRefresher:
+    """Periodic bulk rebuild of the scores"""
+
+    def __init__(self):
+        self._task = PeriodicTask(
+            "Popularity refresh", settings.POPULARITY_REFRESH_INTERVAL, self.refresh, initial_delay=0
+        )
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+    async def refresh(self) -> None:
+        def run():
+            db = SessionLocal()
+            try:
+                count = PopularityService.rebuild(db, settings.POPULARITY_REFRESH_INTERVAL / 2)
+                db.commit()
+                return count
+            finally:
+                db.close()
+        count = await asyncio.to_thread(run)
+        if count is not None:
+            logger.info(f"Popularity scores rebuilt for {count} product(s)")
+
+
+popularity_refresher = PopularityRefresher()
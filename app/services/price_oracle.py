@@ -0,0 +1,221 @@
+"""
+Exchange rates for product prices and crypto checkout.
+
+`PriceOracle` keeps one snapshot of USD prices for every supported currency,
+fetched from a pluggable `PriceSource` (CoinGecko by default, fixed rates
+with PRICE_SOURCE=static):
+
+- younger than PRICE_TTL               -> served from memory
+- older, but younger than PRICE_MAX_STALE -> served from memory while one
+                                          background refresh runs
+- missing or older than PRICE_MAX_STALE -> the caller waits for a refresh
+
+Concurrent refreshes are collapsed into one upstream call (single flight).
+The lifespan refreshes the snapshot every PRICE_TTL seconds, so checkout
+normally never waits on an upstream quote. Listeners added with
+`on_refresh()` get every new snapshot, in a background task.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import httpx
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# Pegged to the US dollar: always 1.0, never fetched
+USD_PEGGED = {"USD", "USDT", "USDC", "DAI", "BUSD"}
+# Currency -> CoinGecko coin id
+COINGECKO_IDS = {
+    "TON": "the-open-network",
+    "BNB": "binancecoin",
+    "ETH": "ethereum",
+}
+SUPPORTED_CURRENCIES = USD_PEGGED | set(COINGECKO_IDS) | {"EUR"}
+
+
+class UnsupportedCurrency(ValueError):
+    pass
+
+
+class PriceUnavailable(Exception):
+    """No quote could be fetched and none is cached recently enough"""
+
+
+class PriceSource(ABC):
+    """Where quotes come from: USD price of each requested currency"""
+
+    @abstractmethod
+    async def fetch(self, currencies: Iterable[str]) -> Dict[str, float]:
+        """USD price of each of `currencies` that the source knows"""
+
+    async def aclose(self) -> None:
+        pass
+
+
+class StaticSource(PriceSource):
+    """Fixed rates (development, tests, or an operator-maintained table)"""
+
+    def __init__(self, prices: Dict[str, float]):
+        self.prices = {currency.upper(): price for currency, price in prices.items()}
+
+    async def fetch(self, currencies: Iterable[str]) -> Dict[str, float]:
+        return {currency: self.prices[currency] for currency in currencies if currency in self.prices}
+
+
+class CoinGeckoSource(PriceSource):
+    """CoinGecko /simple/price, one pooled client, one request for all currencies"""
+
+    def __init__(self, api_url: str, timeout: float):
+        self.api_url = api_url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(self.timeout))
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, currencies: Iterable[str]) -> Dict[str, float]:
+        ids = {COINGECKO_IDS[currency]: currency for currency in currencies if currency in COINGECKO_IDS}
+        # EUR is derived from USDT quoted in both USD and EUR
+        ids["tether"] = "USDT"
+        response = await self.client.get(
+            self.api_url, params={"ids": ",".join(ids), "vs_currencies": "usd,eur"}
+        )
+        response.raise_for_status()
+        data = response.json()
+        prices = {
+            currency: float(data[coin_id]["usd"])
+            for coin_id, currency in ids.items()
+            if coin_id != "tether" and data.get(coin_id, {}).get("usd")
+        }
+        tether = data.get("tether", {})
+        if tether.get("usd") and tether.get("eur"):
+            prices["EUR"] = float(tether["usd"]) / float(tether["eur"])
+        return prices
+
+
+def create_price_source() -> PriceSource:
+    if settings.PRICE_SOURCE == "static":
+        return StaticSource(settings.PRICE_STATIC_USD)
+    return CoinGeckoSource(settings.PRICE_API_URL, settings.PRICE_TIMEOUT)
+
+
+class PriceOracle:
+    """USD prices with stale-while-revalidate and single-flight refresh"""
+
+    def __init__(self, source: PriceSource, ttl: float, max_stale: float):
+        self.source = source
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.prices: Dict[str, float] = {}
+        self.fetched_at: Optional[float] = None  # time.monotonic() of the snapshot
+        self.refreshes = 0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task = PeriodicTask("Price oracle refresh", ttl, self.refresh)
+        self._listeners: List[Callable[[Dict[str, float]], Awaitable[None]]] = []
+        self._notifying: Set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Fetch a first snapshot in the background and keep it fresh"""
+        self._refresh_in_background()
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+        if self._refreshing is not None:
+            self._refreshing.cancel()
+            self._refreshing = None
+        await self.source.aclose()
+
+    def on_refresh(self, listener: Callable[[Dict[str, float]], Awaitable[None]]) -> None:
+        self._listeners.append(listener)
+
+    def age(self) -> Optional[float]:
+        return None if self.fetched_at is None else time.monotonic() - self.fetched_at
+
+    async def refresh(self) -> None:
+        """Fetch a new snapshot; joins the refresh already in flight, if any"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._fetch(), name="price oracle fetch")
+        # shield: a caller giving up must not cancel the fetch for the others
+        await asyncio.shield(self._refreshing)
+
+    def _refresh_in_background(self) -> None:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._fetch_logged(), name="price oracle fetch")
+
+    async def _fetch(self) -> None:
+        prices = await self.source.fetch(sorted(SUPPORTED_CURRENCIES - USD_PEGGED))
+        self.prices = {**self.prices, **prices}
+        self.fetched_at = time.monotonic()
+        self.refreshes += 1
+        if self._listeners:
+            # Not awaited: callers waiting for the quote don't wait for the listeners
+            task = asyncio.create_task(self._notify(dict(self.prices)), name="price oracle listeners")
+            self._notifying.add(task)
+            task.add_done_callback(self._notifying.discard)
+
+    async def _notify(self, prices: Dict[str, float]) -> None:
+        for listener in self._listeners:
+            try:
+                await listener(prices)
+            except Exception as e:
+                logger.error(f"Price refresh listener failed: {e}")
+
+    async def _fetch_logged(self) -> None:
+        try:
+            await self._fetch()
+        except Exception as e:
+            logger.warning(f"Price refresh failed, keeping the previous quotes: {e}")
+
+    def cached_usd(self, currency: str) -> Optional[float]:
+        """USD price from the current snapshot, however old; None if unknown. Never fetches."""
+        currency = (currency or "").upper()
+        if currency in USD_PEGGED:
+            return 1.0
+        return self.prices.get(currency)
+
+    async def get_usd(self, currency: str) -> float:
+        """USD price of one unit of `currency`"""
+        currency = currency.upper()
+        if currency in USD_PEGGED:
+            return 1.0
+        if currency not in SUPPORTED_CURRENCIES:
+            raise UnsupportedCurrency(f"Unsupported currency: {currency}")
+        age = self.age()
+        if age is None or age >= self.max_stale:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Price refresh failed: {e}")
+            if self.age() is None or self.age() >= self.max_stale:
+                raise PriceUnavailable(f"No recent {currency} quote")
+        elif age >= self.ttl:
+            self._refresh_in_background()
+        price = self.prices.get(currency)
+        if not price:
+            raise PriceUnavailable(f"No {currency} quote")
+        return price
+
+    async def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+        """`amount` of `from_currency` expressed in `to_currency`"""
+        if from_currency.upper() == to_currency.upper():
+            return amount
+        from_usd, to_usd = await asyncio.gather(self.get_usd(from_currency), self.get_usd(to_currency))
+        return amount * from_usd / to_usd
+
+
+price_oracle = PriceOracle(create_price_source(), settings.PRICE_TTL, settings.PRICE_MAX_STALE)
@@ -0,0 +1,98 @@
+"""
+Product prices in the reference currency (USD).
+
+`Product.price_base` holds `price` converted to USD, so price filters and
+sorts compare one unit across TON/EUR/USD listings and run as range scans
+on (category, price_base) and (price_base, id). It is set from the cached
+rates when a product is saved, and recomputed in bulk (one UPDATE per
+currency, on the upper-case `currency` column) when a rate refresh moves a
+currency by more than PRICE_BASE_RECOMPUTE_THRESHOLD since this process's
+last recompute. The UPDATE only rewrites rows whose price_base is NULL or
+off by more than the threshold, so workers starting with the same rates
+(each one recomputes on its first snapshot) write nothing after the first.
+Products whose currency has no known rate keep price_base NULL and are left
+out of price filters and sorts.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.product import Product
+from app.services.price_oracle import USD_PEGGED, price_oracle
+
+logger = logging.getLogger(__name__)
+
+
+class ProductPricing:
+    """Keeps Product.price_base in line with the exchange rates"""
+
+    # Currency -> USD rate of the last bulk recompute in this process
+    _applied: Dict[str, float] = {}
+
+    @staticmethod
+    def base_price(price: Optional[float], currency: Optional[str]) -> Optional[float]:
+        """`price` in USD from the cached rates, None if the rate is unknown"""
+        rate = price_oracle.cached_usd(currency or "TON")
+        if price is None or rate is None:
+            return None
+        return price * rate
+
+    @staticmethod
+    def apply(product: Product) -> None:
+        """Set price_base before the product is saved"""
+        product.price_base = ProductPricing.base_price(product.price, product.currency)
+
+    @staticmethod
+    def recompute(db: Session, rates: Dict[str, float]) -> Dict[str, int]:
+        """
+        Rewrite price_base of the products in a currency whose rate moved
+        enough, where it is off by more than the threshold. Returns
+        currency -> rows updated. The caller commits.
+        """
+        threshold = settings.PRICE_BASE_RECOMPUTE_THRESHOLD
+        updated = {}
+        for currency, rate in sorted(rates.items()):
+            previous = ProductPricing._applied.get(currency)
+            if previous and abs(rate - previous) / previous <= threshold:
+                continue
+            price_base = Product.price * rate
+            updated[currency] = db.execute(
+                update(Product)
+                .where(
+                    Product.currency == currency,
+                    or_(
+                        Product.price_base.is_(None),
+                        func.abs(Product.price_base - price_base) > price_base * threshold,
+                    ),
+                )
+                .values(price_base=price_base)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        return updated
+
+    @staticmethod
+    async def on_rates_refreshed(prices: Dict[str, float]) -> None:
+        """Price oracle listener: bulk recompute in a worker thread"""
+        rates = dict(prices)
+        if not ProductPricing._applied:
+            # First snapshot of this process: also fill rows saved before any rate was known
+            rates.update({currency: 1.0 for currency in USD_PEGGED})
+
+        def run():
+            db = SessionLocal()
+            try:
+                updated = ProductPricing.recompute(db, rates)
+                db.commit()
+                return updated
+            finally:
+                db.close()
+
+        updated = await asyncio.to_thread(run)
+        ProductPricing._applied.update({currency: rates[currency] for currency in updated})
+        if any(updated.values()):
+            logger.info(f"Recomputed price_base: {updated}")
@@ -0,0 +1,97 @@
+"""
+Full-text search for the product catalogue.
+
+PostgreSQL: GIN index on a tsvector expression (kept in sync by Postgres itself).
+SQLite (dev): FTS5 virtual table `products_fts`, kept in sync by triggers on
+products (migrations 0002 and 0011).
+"""
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import column, false, func, literal_column, select, table, text
+from sqlalchemy.orm import Query, Session
+
+from app.models.product import Product
+
+# Text search config: 'simple' does no stemming, the catalogue mixes French and English
+TS_CONFIG = "simple"
+
+# Must stay identical to the indexed expression, otherwise Postgres won't use the index
+PG_DOCUMENT = (
+    f"to_tsvector('{TS_CONFIG}', coalesce(products.title, '') || ' ' || "
+    f"coalesce(products.description, ''))"
+)
+
+FTS_TABLE = "products_fts"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchService:
+    """Indexed product search with relevance ranking"""
+
+    # Per-dialect availability, resolved lazily (SQLite may be built without FTS5)
+    _fts_available: dict = {}
+
+    @staticmethod
+    def is_available(db: Session) -> bool:
+        dialect = db.get_bind().dialect.name
+        if dialect not in SearchService._fts_available:
+            if dialect == "postgresql":
+                available = True
+            elif dialect == "sqlite":
+                available = db.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE}
+                ).first() is not None
+            else:
+                available = False
+            SearchService._fts_available[dialect] = available
+        return SearchService._fts_available[dialect]
+
+    @staticmethod
+    def _fts5_query(search: str) -> Optional[str]:
+        # Quote every word so user input can't inject FTS5 syntax; prefix-match each term
+        terms = _WORD_RE.findall(search)
+        if not terms:
+            return None
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def apply_search(db: Session, query: Query, search: str) -> Tuple[Query, Optional[object]]:
+        """
+        Restrict `query` to products matching `search`.
+
+        Returns the filtered query and a rank expression (higher is more relevant),
+        or None when falling back to the unindexed ILIKE scan.
+        """
+        dialect = db.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            document = literal_column(PG_DOCUMENT)
+            ts_query = func.plainto_tsquery(literal_column(f"'{TS_CONFIG}'"), search)
+            query = query.filter(document.op("@@")(ts_query))
+            return query, func.ts_rank(document, ts_query)
+
+        if dialect == "sqlite" and SearchService.is_available(db):
+            match = SearchService._fts5_query(search)
+            if match is None:
+                return query.filter(false()), None
+            # bm25() is lower for better matches, negate it so callers can sort desc
+            fts = table(FTS_TABLE, column("rowid"))
+            hits = (
+                select(
+                    fts.c.rowid.label("product_id"),
+                    literal_column(f"-bm25({FTS_TABLE})").label("rank"),
+                )
+                .where(text(f"{FTS_TABLE} MATCH :search").bindparams(search=match))
+                .subquery()
+            )
+            query = query.join(hits, hits.c.product_id == Product.id)
+            return query, hits.c.rank
+
+        search_term = f"%{search}%"
+        query = query.filter(
+            Product.title.ilike(search_term) | Product.description.ilike(search_term)
+        )
+        return query, None
@@ -0,0 +1,66 @@
+"""
+Leases for background tasks that one worker at a time should run.
+
+Every uvicorn worker and replica starts the same lifespan tasks. A task
+that must not run in several of them at once takes a `TaskLease` row before
+each run: a compare-and-set UPDATE succeeds if the lease is free, expired,
+or already held by this worker, and extends it by `ttl` seconds. A worker
+that dies simply lets its lease expire.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from app.db.session import SessionLocal
+from app.models.task_lease import TaskLease
+
+# This process, as a lease holder
+WORKER_ID = uuid.uuid4().hex
+
+
+class LeaseService:
+    """Take, extend and release task leases. Each call is its own transaction."""
+
+    @staticmethod
+    def acquire(name: str, ttl: float, holder: str = WORKER_ID) -> bool:
+        """Take or extend lease `name` for `ttl` seconds. False if another worker holds it."""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            taken = db.execute(
+                update(TaskLease)
+                .where(
+                    TaskLease.name == name,
+                    or_(TaskLease.holder == holder, TaskLease.holder.is_(None), TaskLease.expires_at < now),
+                )
+                .values(holder=holder, expires_at=now + timedelta(seconds=ttl))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not taken:
+                try:
+                    with db.begin_nested():
+                        db.add(TaskLease(name=name, holder=holder, expires_at=now + timedelta(seconds=ttl)))
+                    taken = 1
+                except IntegrityError:
+                    pass  # the lease exists and someone else holds it
+            db.commit()
+            return bool(taken)
+        finally:
+            db.close()
+
+    @staticmethod
+    def release(name: str, holder: str = WORKER_ID) -> None:
+        """Give lease `name` back, so another worker can take it right away"""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(TaskLease)
+                .where(TaskLease.name == name, TaskLease.holder == holder)
+                .values(holder=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
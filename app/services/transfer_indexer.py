@@ -0,0 +1,231 @@
+"""
+Automatic matching of incoming USDT payments.
+
+Every INDEXER_POLL_INTERVAL seconds, the `TransferIndexer` scans new blocks for BEP-20 Transfer logs of the USDT
+contract sent to any registered BSC seller wallet. Blocks are read in
+ranges of INDEXER_BLOCK_RANGE. Each range is one JSON-RPC batch of
+eth_getLogs calls, with up to INDEXER_ADDRESSES_PER_QUERY recipient
+addresses OR-ed in each call. Only blocks with BSC_CONFIRMATIONS on top are
+scanned, so a matched transfer is final.
+
+Logs are matched in memory to pending payments without a tx hash by
+(to_address, amount), oldest payment first, and only to payments whose
+start block (the chain head at /payment/init) is older than the log's block:
+an earlier transfer of the same amount never pays a new order. Payments
+without a start block are left to the buyer. A range's matches and the new
+checkpoint (`ChainCheckpoint`) are committed together, so a range is never
+matched twice; a payment whose transfer hash turns out to be attached by hand
+to another payment goes back in the queue. While nothing is waiting, the
+checkpoint follows the last final block without scanning. Buyers can still
+attach a hash by hand through /crypto/payment/verify.
+"""
+import asyncio
+import logging
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.db.session import SessionLocal
+from app.models.crypto import ChainCheckpoint, CryptoTransaction, CryptoWallet
+from app.services.crypto_service import (
+    TRANSFER_TOPIC, USDT_BSC_CONTRACT, address_topic, bsc_rpc_client, to_units, topic_address,
+)
+from app.services.payment_confirmations import CONFIRMED, PENDING, PaymentConfirmationService
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "bsc:usdt-transfers"
+
+# (to_address, amount in token units) -> pending payments {"id", "order_id", "start_block"}, oldest first
+PaymentIndex = Dict[Tuple[str, int], Deque[dict]]
+
+
+class TransferIndexer:
+    """Matches USDT transfers to pending payments, range by range"""
+
+    def __init__(self):
+        self._task = PeriodicTask("USDT transfer indexer", settings.INDEXER_POLL_INTERVAL, self.run)
+        self.matched = 0
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+    async def run(self) -> None:
+        """Scan from the checkpoint up to the last final block."""
+        # Head first: a payment created after _load starts at or after this block
+        head = int(await bsc_rpc_client.call("eth_blockNumber", []), 16)
+        safe = head - settings.BSC_CONFIRMATIONS + 1
+        addresses, payments = await asyncio.to_thread(self._load)
+        checkpoint = await asyncio.to_thread(self._checkpoint, safe)
+        if not addresses or not payments:
+            # Nothing to match: skip the blocks, no payment can take their transfers
+            if checkpoint < safe:
+                await asyncio.to_thread(self._commit, checkpoint, safe, [])
+            return
+        start = max(checkpoint, safe - settings.INDEXER_BACKFILL_BLOCKS)
+        while start < safe:
+            end = min(start + settings.INDEXER_BLOCK_RANGE, safe)
+            logs = await self.fetch(addresses, start + 1, end)
+            updates = self.match(logs, payments, head)
+            taken = await asyncio.to_thread(self._commit, checkpoint, end, updates)
+            if taken is None:
+                logger.info("USDT transfer indexer: checkpoint moved by another worker, stopping this run")
+                return
+            if taken:
+                self.requeue([item for item in updates if item["tx_hash"] in taken], payments)
+            matched = len(updates) - len(taken)
+            if matched:
+                self.matched += matched
+                logger.info(f"USDT transfer indexer: {matched} payment(s) matched in blocks {start + 1}-{end}")
+            checkpoint = start = end
+
+    @staticmethod
+    async def fetch(addresses: List[str], from_block: int, to_block: int) -> List[dict]:
+        """Transfer logs to `addresses` in [from_block, to_block], one JSON-RPC batch"""
+        size = settings.INDEXER_ADDRESSES_PER_QUERY
+        calls = [
+            ("eth_getLogs", [{
+                "fromBlock": hex(from_block),
+                "toBlock": hex(to_block),
+                "address": USDT_BSC_CONTRACT,
+                "topics": [TRANSFER_TOPIC, None, [address_topic(address) for address in addresses[i:i + size]]],
+            }])
+            for i in range(0, len(addresses), size)
+        ]
+        results = await bsc_rpc_client.batch(calls)
+        return [log for logs in results for log in logs]
+
+    @staticmethod
+    def match(logs: List[dict], payments: PaymentIndex, head: int) -> List[dict]:
+        """
+        Pair logs with pending payments (consumed from `payments`). Returns
+        updates for `PaymentConfirmationService.apply`.
+        """
+        used_hashes = set()
+        now = datetime.utcnow()
+        updates = []
+        logs = sorted(logs, key=lambda log: (int(log["blockNumber"], 16), int(log["logIndex"], 16)))
+        for log in logs:
+            if log.get("removed") or len(log["topics"]) < 3:
+                continue
+            # One payment per transaction hash (tx_hash is unique)
+            if log["transactionHash"] in used_hashes:
+                continue
+            key = (topic_address(log["topics"][2]), int(log["data"], 16))
+            block_number = int(log["blockNumber"], 16)
+            # Oldest payment initialised before this block
+            payment = next((item for item in payments.get(key, ()) if item["start_block"] < block_number), None)
+            if payment is None:
+                continue
+            payments[key].remove(payment)
+            used_hashes.add(log["transactionHash"])
+            updates.append({
+                "id": payment["id"],
+                "order_id": payment["order_id"],
+                "tx_hash": log["transactionHash"],
+                "status": CONFIRMED,
+                "from_address": topic_address(log["topics"][1]),
+                "block_number": block_number,
+                "confirmations": head - block_number + 1,
+                "confirmed_at": now,
+                # for requeue
+                "to_address": key[0],
+                "units": key[1],
+                "start_block": payment["start_block"],
+            })
+        return updates
+
+    @staticmethod
+    def requeue(updates: List[dict], payments: PaymentIndex) -> None:
+        """Put the payments of `updates` that were not stored back in `payments`"""
+        for item in updates:
+            key = (item["to_address"], item["units"])
+            payment = {"id": item["id"], "order_id": item["order_id"], "start_block": item["start_block"]}
+            payments[key] = deque(sorted([*payments.get(key, ()), payment], key=lambda p: p["id"]))
+
+    @staticmethod
+    def _load() -> Tuple[List[str], PaymentIndex]:
+        """Seller addresses and the pending payments waiting for a transfer"""
+        db = SessionLocal()
+        try:
+            addresses = sorted({
+                address.lower() for address in db.scalars(
+                    select(CryptoWallet.wallet_address).where(CryptoWallet.network == "bsc").distinct()
+                )
+            })
+            rows = db.execute(
+                select(
+                    CryptoTransaction.id, CryptoTransaction.order_id,
+                    CryptoTransaction.to_address, CryptoTransaction.amount, CryptoTransaction.start_block,
+                ).where(
+                    CryptoTransaction.status == PENDING,
+                    CryptoTransaction.tx_hash.is_(None),
+                    CryptoTransaction.start_block.is_not(None),
+                    CryptoTransaction.network == "bsc",
+                    CryptoTransaction.currency == "USDT",
+                ).order_by(CryptoTransaction.id)
+            ).all()
+        finally:
+            db.close()
+        payments: PaymentIndex = defaultdict(deque)
+        for row in rows:
+            payments[(row.to_address.lower(), to_units(row.amount))].append(
+                {"id": row.id, "order_id": row.order_id, "start_block": row.start_block}
+            )
+        return addresses, payments
+
+    @staticmethod
+    def _checkpoint(safe: int) -> int:
+        """Last scanned block, created INDEXER_BACKFILL_BLOCKS behind `safe` on first run"""
+        db = SessionLocal()
+        try:
+            checkpoint = db.scalar(select(ChainCheckpoint).where(ChainCheckpoint.name == CHECKPOINT_NAME))
+            if checkpoint is None:
+                checkpoint = ChainCheckpoint(
+                    name=CHECKPOINT_NAME, block_number=max(safe - settings.INDEXER_BACKFILL_BLOCKS, 0)
+                )
+                db.add(checkpoint)
+                db.commit()
+            return checkpoint.block_number
+        finally:
+            db.close()
+
+    @staticmethod
+    def _commit(previous: int, block_number: int, updates: List[dict]) -> Optional[Set[str]]:
+        """
+        Move the checkpoint and store the matches atomically. Returns the hashes
+        of `updates` not stored because a payment already has them, None if
+        another worker moved the checkpoint first.
+        """
+        db = SessionLocal()
+        try:
+            moved = db.execute(
+                update(ChainCheckpoint)
+                .where(ChainCheckpoint.name == CHECKPOINT_NAME, ChainCheckpoint.block_number == previous)
+                .values(block_number=block_number)
+            ).rowcount
+            if not moved:
+                db.rollback()
+                return None
+            taken: Set[str] = set()
+            if updates:
+                # A hash the buyer already attached by hand is not matched again
+                taken = set(db.scalars(
+                    select(CryptoTransaction.tx_hash).where(
+                        CryptoTransaction.tx_hash.in_([item["tx_hash"] for item in updates])
+                    )
+                ))
+                PaymentConfirmationService.apply(db, [item for item in updates if item["tx_hash"] not in taken])
+            db.commit()
+            return taken
+        finally:
+            db.close()
+
+transfer_indexer = TransferIndexer()
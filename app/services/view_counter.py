@@ -0,0 +1,171 @@
+"""
+Write-behind product view counters.
+
+`read_product` only calls `view_counter.record()`, which adds 1 to an
+in-memory count for the product; no database write happens on the read path.
+Every VIEW_FLUSH_INTERVAL seconds (and once more on shutdown) the counts are
+swapped out and written in one transaction:
+
+- one executemany UPDATE adding each product's views to Product.view_count
+  and its decayed weight to Product.popularity
+- the per-day totals of product_view_daily: executemany UPDATE of the rows
+  that exist, one multi-row INSERT for the others
+
+A failed flush puts its counts back in the buffer for the next one. Views
+recorded by a process that is killed before its flush are lost; these are
+statistics, not records.
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.tasks import PeriodicTask
+from app.db.session import SessionLocal
+from app.models.product import Product
+from app.models.product_view import ProductViewDaily
+from app.services.popularity_service import PopularityService, decay_weight
+
+logger = logging.getLogger(__name__)
+
+products = Product.__table__
+view_daily = ProductViewDaily.__table__
+
+# Plain Core statements, run with a list of parameters (executemany)
+ADD_PRODUCT_VIEWS = (
+    update(products)
+    .where(products.c.id == bindparam("pid"))
+    .values(
+        view_count=products.c.view_count + bindparam("n"),
+        popularity=products.c.popularity + bindparam("score"),
+    )
+)
+ADD_DAILY_VIEWS = (
+    update(view_daily)
+    .where(view_daily.c.product_id == bindparam("pid"), view_daily.c.day == bindparam("d"))
+    .values(views=view_daily.c.views + bindparam("n"))
+)
+
+
+class ViewCounter:
+    """Aggregates view increments per product and flushes them in batches"""
+
+    def __init__(self, interval: float):
+        self._counts: Counter = Counter()
+        # record() runs in the threadpool of sync endpoints
+        self._lock = threading.Lock()
+        self._task = PeriodicTask("Product view flush", interval, self.flush)
+        self._writing: Optional[asyncio.Future] = None
+        self.flushes = 0
+        self.views = 0
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write what is still buffered."""
+        await self._task.stop()
+        await self.flush()
+
+    def record(self, product_id: int, views: int = 1) -> None:
+        with self._lock:
+            self._counts[product_id] += views
+
+    def take(self) -> Dict[int, int]:
+        """Swap out the buffered counts (product id -> views)"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return dict(counts)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._counts.values())
+
+    async def flush(self) -> None:
+        if self._writing is not None:
+            # A write cancelled with the periodic task may still be running in its thread
+            await asyncio.wait([self._writing])
+        counts = self.take()
+        if not counts:
+            return
+        self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, counts, datetime.utcnow()))
+        try:
+            await asyncio.shield(self._writing)
+        except Exception as e:
+            logger.error(f"Product view flush failed, {sum(counts.values())} view(s) kept for the next one: {e}")
+            with self._lock:
+                self._counts.update(counts)
+            return
+        finally:
+            if self._writing.done():
+                self._writing = None
+        self.flushes += 1
+        self.views += sum(counts.values())
+
+    @staticmethod
+    def _write(counts: Dict[int, int], now: datetime) -> None:
+        """Runs in a worker thread with its own short-lived session."""
+        db = SessionLocal()
+        try:
+            ViewCounter.apply(db, counts, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def apply(db: Session, counts: Dict[int, int], now: datetime) -> None:
+        """Add `counts` (product id -> views) seen at `now`. The caller commits."""
+        weight = settings.POPULARITY_VIEW_WEIGHT * decay_weight(now, PopularityService.epoch(db))
+        db.execute(
+            ADD_PRODUCT_VIEWS,
+            # Rows locked in id order in every worker: no deadlock between concurrent flushes
+            [{"pid": product_id, "n": n, "score": n * weight} for product_id, n in sorted(counts.items())],
+        )
+        ViewCounter._add_daily(db, counts, now.date())
+
+    @staticmethod
+    def _add_daily(db: Session, counts: Dict[int, int], day: date) -> None:
+        existing = set(db.scalars(
+            select(ProductViewDaily.product_id).where(
+                ProductViewDaily.day == day, ProductViewDaily.product_id.in_(list(counts))
+            )
+        ))
+        if existing:
+            db.execute(
+                ADD_DAILY_VIEWS,
+                [{"pid": product_id, "d": day, "n": counts[product_id]} for product_id in sorted(existing)],
+            )
+        new = [
+            {"product_id": product_id, "day": day, "views": n}
+            for product_id, n in sorted(counts.items()) if product_id not in existing
+        ]
+        if not new:
+            return
+        try:
+            with db.begin_nested():
+                db.execute(insert(ProductViewDaily), new)
+        except IntegrityError:
+            # Row created concurrently by another process, or product deleted:
+            # same upsert one product at a time
+            for row in new:
+                params = {"pid": row["product_id"], "d": day, "n": row["views"]}
+                if db.execute(ADD_DAILY_VIEWS, params).rowcount:
+                    continue
+                try:
+                    with db.begin_nested():
+                        db.execute(insert(ProductViewDaily), row)
+                except IntegrityError:
+                    db.execute(ADD_DAILY_VIEWS, params)
+
+
+view_counter = ViewCounter(settings.VIEW_FLUSH_INTERVAL)
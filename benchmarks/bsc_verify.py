@@ -0,0 +1,121 @@
+"""
+BSC payment verification: one client per call vs. the pooled client with the
+tx-hash result cache.
+
+Starts a local stand-in for the BscScan API (uvicorn on a free port, fixed
+latency per request) and verifies a set of transaction hashes, each one
+several times (clients retrying /crypto/payment/verify), two ways:
+
+  new client           what verify_bsc_transaction used to do
+  pooled + cache       CryptoService.verify_bsc_transaction
+
+Run from the project root:
+    python -m benchmarks.bsc_verify [--txs 50] [--repeats 3] [--latency-ms 50]
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.services import crypto_service
+from app.services.crypto_service import (
+    TRANSFER_TOPIC, USDT_BSC_CONTRACT, BscScanClient, CryptoService, address_topic, to_units
+)
+
+
+class MockBscScan:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.app = Starlette(routes=[Route("/api", self.api)])
+
+    async def api(self, request: Request) -> JSONResponse:
+        self.requests += 1
+        params = request.query_params
+        tx_hash = params["txhash"]
+        await asyncio.sleep(self.latency)
+        if params["action"] == "gettxreceiptstatus":
+            return JSONResponse({"status": "1", "message": "OK", "result": {"status": "1"}})
+        if params["action"] == "eth_getTransactionByHash":
+            return JSONResponse({"jsonrpc": "2.0", "id": 1, "result": {
+                "hash": tx_hash, "from": "0xbuyer", "to": USDT_BSC_CONTRACT, "blockNumber": hex(1000 + len(tx_hash)),
+            }})
+        return JSONResponse({"jsonrpc": "2.0", "id": 1, "result": {
+            "transactionHash": tx_hash, "status": "0x1", "from": "0xbuyer", "to": USDT_BSC_CONTRACT,
+            "blockNumber": hex(1000 + len(tx_hash)),
+            "logs": [{
+                "address": USDT_BSC_CONTRACT,
+                "topics": [TRANSFER_TOPIC, address_topic("0xbuyer"), address_topic("0xseller")],
+                "data": hex(to_units(10)),
+            }],
+        }})
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def serial_new_client(url: str, tx_hash: str) -> bool:
+    """The former implementation: a new AsyncClient and two sequential calls per verification."""
+    async with httpx.AsyncClient() as client:
+        response = await client.get(url, params={"module": "transaction", "action": "gettxreceiptstatus", "txhash": tx_hash})
+        if response.json().get("status") != "1":
+            return False
+        await client.get(url, params={"module": "proxy", "action": "eth_getTransactionByHash", "txhash": tx_hash})
+        return True
+
+
+async def pooled(tx_hash: str) -> bool:
+    # Head far above the mock's blocks: every receipt is final, as for settled payments
+    return (await CryptoService.verify_bsc_transaction(tx_hash, head=10 ** 6))["success"]
+
+
+async def run(label: str, mock: MockBscScan, verify, hashes: list, repeats: int) -> None:
+    mock.requests = 0
+    start = time.perf_counter()
+    ok = 0
+    for _ in range(repeats):
+        # Each round: every pending payment verified once, concurrently
+        ok += sum(await asyncio.gather(*(verify(tx_hash) for tx_hash in hashes)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {elapsed * 1000:9.1f} ms  verified={ok:<6} explorer_requests={mock.requests}")
+
+
+async def main(n_txs: int, repeats: int, latency_ms: float) -> None:
+    mock = MockBscScan(latency_ms / 1000)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(mock.app, host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/api"
+    hashes = [f"0x{i:064x}" for i in range(n_txs)]
+    print(f"{n_txs} transactions x {repeats} verifications, {latency_ms:g} ms mock latency")
+
+    await run("new client", mock, lambda tx_hash: serial_new_client(url, tx_hash), hashes, repeats)
+
+    client = BscScanClient(url, None, timeout=10, max_concurrency=5)
+    crypto_service.bscscan_client = client
+    await run("pooled + cache", mock, pooled, hashes, repeats)
+    await client.aclose()
+
+    server.should_exit = True
+    await serve
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--txs", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.txs, args.repeats, args.latency_ms))
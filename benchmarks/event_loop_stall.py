@@ -0,0 +1,89 @@
+"""
+Event-loop stall benchmark: sync Session vs AsyncSession inside `async def` handlers.
+
+A ticker task measures how late the event loop wakes it up while a batch of
+concurrent "requests" run the same query, once through the sync Session
+(what the crypto/notifications endpoints used to do) and once through the
+async session layer.
+
+Run from the project root:
+    python -m benchmarks.event_loop_stall [--requests 20] [--rows 300000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+TICK = 0.005
+
+# CPU-bound query inside the database driver, stands in for a slow SELECT
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) "
+    "SELECT count(*) FROM c"
+)
+
+
+async def measure_lag(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def run(label: str, handler, requests: int) -> None:
+    stop = asyncio.Event()
+    lags: list = []
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    await asyncio.sleep(TICK * 2)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[handler() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    print(
+        f"{label:<14} total={elapsed * 1000:8.1f} ms  "
+        f"loop lag max={max(lags, default=0) * 1000:8.1f} ms  "
+        f"p99={p99 * 1000:8.1f} ms  median={statistics.median(lags or [0]) * 1000:6.2f} ms"
+    )
+
+
+async def main(requests: int, rows: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(bind=async_engine)
+
+    async def sync_handler():
+        # Before: sync Session called from an async endpoint
+        with SyncSession() as db:
+            db.execute(SLOW_QUERY, {"n": rows}).scalar()
+
+    async def async_handler():
+        # After: deps.get_async_db
+        async with AsyncSession() as db:
+            (await db.execute(SLOW_QUERY, {"n": rows})).scalar()
+
+    print(f"{requests} concurrent requests, recursive CTE of {rows} rows each")
+    await run("sync Session", sync_handler, requests)
+    await run("AsyncSession", async_handler, requests)
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=300000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.rows))
@@ -0,0 +1,120 @@
+"""
+FCM fan-out: one client per notification vs. the pooled, batched client.
+
+Starts a local mock of the FCM legacy HTTP endpoint (uvicorn on a free port,
+fixed latency per request, "bad-" tokens reported as NotRegistered) and sends
+one notification to N device tokens three ways:
+
+  serial, new client   what send_to_multiple used to do (1 connection per token)
+  pooled, per token    shared client, concurrent single-token requests
+  pooled, batched      shared client, registration_ids batches (FCMClient.send_multicast)
+
+Run from the project root:
+    python -m benchmarks.fcm_fanout [--tokens 200] [--latency-ms 10] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.services.notification_service import FCMClient, NotificationService
+
+
+class MockFCM:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.clients = set()
+        self.app = Starlette(routes=[Route("/fcm/send", self.send, methods=["POST"])])
+
+    async def send(self, request: Request) -> JSONResponse:
+        self.requests += 1
+        self.clients.add(request.client)
+        payload = await request.json()
+        tokens = payload.get("registration_ids") or [payload["to"]]
+        await asyncio.sleep(self.latency)
+        results = [
+            {"error": "NotRegistered"} if token.startswith("bad-") else {"message_id": f"m-{token}"}
+            for token in tokens
+        ]
+        failure = sum(1 for result in results if "error" in result)
+        return JSONResponse({"success": len(tokens) - failure, "failure": failure, "results": results})
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.clients = set()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def serial_new_client(url: str, tokens: list, message: dict) -> int:
+    """The former implementation: one AsyncClient (and connection) per token, awaited in turn."""
+    ok = 0
+    for token in tokens:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(url, json={"to": token, **message}, headers={"Authorization": "key=bench"})
+            ok += "error" not in response.json()["results"][0]
+    return ok
+
+
+async def run(label: str, mock: MockFCM, coro) -> None:
+    mock.reset()
+    start = time.perf_counter()
+    ok = await coro
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<20} {elapsed * 1000:9.1f} ms  delivered={ok:<6} "
+        f"requests={mock.requests:<6} connections={len(mock.clients)}"
+    )
+
+
+async def main(n_tokens: int, latency_ms: float, concurrency: int) -> None:
+    mock = MockFCM(latency_ms / 1000)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(mock.app, host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/fcm/send"
+    tokens = [f"bad-{i}" if i % 50 == 0 else f"token-{i}" for i in range(n_tokens)]
+    message = NotificationService.build_message("Benchmark", "Hello")
+    print(f"{n_tokens} tokens, {latency_ms:g} ms mock latency, concurrency {concurrency}")
+
+    await run("serial, new client", mock, serial_new_client(url, tokens, message))
+
+    per_token = FCMClient(url, "bench", timeout=10, max_concurrency=concurrency, batch_size=1)
+    outcome = per_token.send_multicast(tokens, message)
+    await run("pooled, per token", mock, _delivered(outcome))
+    await per_token.aclose()
+
+    batched = FCMClient(url, "bench", timeout=10, max_concurrency=concurrency, batch_size=1000)
+    await run("pooled, batched", mock, _delivered(batched.send_multicast(tokens, message)))
+    await batched.aclose()
+
+    server.should_exit = True
+    await serve
+
+
+async def _delivered(outcome) -> int:
+    return sum(1 for error in (await outcome).values() if error is None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.tokens, args.latency_ms, args.concurrency))
@@ -0,0 +1,105 @@
+"""
+Login throughput vs. catalogue reads.
+
+Drives the app in-process (httpx ASGITransport, temporary SQLite database):
+first catalogue reads alone, then the same reads while login loops hammer
+/login/access-token. Reports logins/sec, fast-failed logins (503) and the
+catalogue latency, which should barely move now that bcrypt runs on its own
+bounded pool instead of the shared request threadpool.
+
+Run from the project root:
+    python -m benchmarks.login_throughput [--seconds 5] [--readers 8] [--logins 16]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+import httpx  # noqa: E402
+
+from app import models  # noqa: E402
+from app.core.security import get_password_hash  # noqa: E402
+from app.db.session import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+EMAIL, PASSWORD = "bench@example.com", "bench-password"
+
+
+def seed() -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    vendor = models.User(email=EMAIL, hashed_password=get_password_hash(PASSWORD), is_vendor=True)
+    db.add(vendor)
+    db.flush()
+    db.add_all([
+        models.Product(title=f"Product {i}", price=float(i), seller_id=vendor.id) for i in range(200)
+    ])
+    db.commit()
+    db.close()
+
+
+async def reader(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/api/v1/products/", params={"limit": 20})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def login(client: httpx.AsyncClient, stop: asyncio.Event, results: dict) -> None:
+    while not stop.is_set():
+        response = await client.post(
+            "/api/v1/login/access-token", data={"username": EMAIL, "password": PASSWORD}
+        )
+        results[response.status_code] = results.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(0.05)
+
+
+def report(label: str, latencies: list, seconds: float) -> None:
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{label:<22} reads/s={len(latencies) / seconds:8.1f}  "
+        f"p50={statistics.median(latencies) * 1000:7.1f} ms  p99={p99 * 1000:7.1f} ms"
+    )
+
+
+async def main(seconds: float, readers: int, logins: int) -> None:
+    seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = asyncio.Event()
+        latencies: list = []
+        tasks = [asyncio.create_task(reader(client, stop, latencies)) for _ in range(readers)]
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+        report("catalogue alone", latencies, seconds)
+
+        stop = asyncio.Event()
+        latencies = []
+        results: dict = {}
+        tasks = [asyncio.create_task(reader(client, stop, latencies)) for _ in range(readers)]
+        tasks += [asyncio.create_task(login(client, stop, results)) for _ in range(logins)]
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+        report("catalogue + logins", latencies, seconds)
+        print(
+            f"{'logins':<22} ok/s={results.get(200, 0) / seconds:8.1f}  "
+            f"rejected (503)={results.get(503, 0)}  other={sum(results.values()) - results.get(200, 0) - results.get(503, 0)}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.readers, args.logins))
@@ -0,0 +1,184 @@
+"""
+USDT transfer indexer against a local mock chain.
+
+Starts a mock BSC JSON-RPC node (uvicorn on a free port, fixed latency per
+HTTP request, JSON-RPC batches supported) whose blocks hold random USDT
+Transfer logs: background traffic plus one payment per pending order to a
+seller wallet. Then it scans the chain for the sellers' incoming transfers
+two ways and matches them to the pending payments in memory:
+
+  per address       one eth_getLogs request per seller per block range
+  batched           TransferIndexer.fetch: all sellers OR-ed in one JSON-RPC
+                    batch per block range
+
+Run from the project root:
+    python -m benchmarks.transfer_indexer [--blocks 10000] [--sellers 100] [--payments 500] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import random
+import socket
+import time
+from collections import defaultdict, deque
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.services import transfer_indexer
+from app.services.crypto_service import TRANSFER_TOPIC, USDT_BSC_CONTRACT, BscRpcClient
+from app.services.transfer_indexer import TransferIndexer, address_topic, to_units
+
+
+class MockChain:
+    """In-memory chain of USDT Transfer logs behind a JSON-RPC endpoint"""
+
+    def __init__(self, head: int, latency: float = 0):
+        self.head = head
+        self.latency = latency
+        self.logs = []
+        self.requests = 0
+        self.calls = 0
+        self.app = Starlette(routes=[Route("/", self.rpc, methods=["POST"])])
+
+    def transfer(self, block: int, sender: str, receiver: str, units: int) -> str:
+        tx_hash = "0x%064x" % (len(self.logs) + 1)
+        self.logs.append({
+            "address": USDT_BSC_CONTRACT.lower(),
+            "topics": [TRANSFER_TOPIC, address_topic(sender), address_topic(receiver)],
+            "data": hex(units),
+            "blockNumber": hex(block),
+            "transactionHash": tx_hash,
+            "logIndex": hex(len(self.logs) % 200),
+            "removed": False,
+        })
+        return tx_hash
+
+    def get_logs(self, query: dict) -> list:
+        from_block, to_block = int(query["fromBlock"], 16), int(query["toBlock"], 16)
+        receivers = query["topics"][2]
+        receivers = {receivers} if isinstance(receivers, str) else set(receivers)
+        return [
+            log for log in self.logs
+            if from_block <= int(log["blockNumber"], 16) <= to_block and log["topics"][2] in receivers
+        ]
+
+    def handle(self, call: dict) -> dict:
+        self.calls += 1
+        if call["method"] == "eth_blockNumber":
+            result = hex(self.head)
+        elif call["method"] == "eth_getLogs":
+            result = self.get_logs(call["params"][0])
+        else:
+            return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32601, "message": "Method not found"}}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": result}
+
+    async def rpc(self, request: Request) -> JSONResponse:
+        self.requests += 1
+        payload = await request.json()
+        await asyncio.sleep(self.latency)
+        if isinstance(payload, list):
+            return JSONResponse([self.handle(call) for call in payload])
+        return JSONResponse(self.handle(payload))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_chain(chain: MockChain, n_blocks: int, n_sellers: int, n_payments: int):
+    """Sellers, pending payments (index for TransferIndexer.match) and the chain's logs"""
+    rng = random.Random(42)
+    sellers = ["0x%040x" % (0xA000 + i) for i in range(n_sellers)]
+    first = chain.head - n_blocks + 1
+    for _ in range(n_blocks // 2):
+        # Unrelated traffic of the token
+        chain.transfer(rng.randint(first, chain.head), "0x%040x" % rng.getrandbits(160), "0x%040x" % rng.getrandbits(160), 10 ** 18)
+    payments = defaultdict(deque)
+    for i in range(n_payments):
+        seller, amount = rng.choice(sellers), round(rng.uniform(5, 500), 2)
+        payments[(seller, to_units(amount))].append({"id": i + 1, "order_id": i + 1, "start_block": first - 1})
+        chain.transfer(rng.randint(first, chain.head), "0x%040x" % (0xB000 + i), seller, to_units(amount))
+    return sellers, payments
+
+
+async def per_address(url: str, sellers: list, from_block: int, to_block: int) -> list:
+    """One request per seller and range (what an explorer getLogs loop would do), 4 in flight"""
+    client = BscRpcClient(url, timeout=30, max_concurrency=4)
+    logs = []
+    try:
+        for start in range(from_block, to_block + 1, settings.INDEXER_BLOCK_RANGE):
+            end = min(start + settings.INDEXER_BLOCK_RANGE - 1, to_block)
+            results = await asyncio.gather(*(
+                client.call("eth_getLogs", [{
+                    "fromBlock": hex(start), "toBlock": hex(end), "address": USDT_BSC_CONTRACT,
+                    "topics": [TRANSFER_TOPIC, None, address_topic(seller)],
+                }])
+                for seller in sellers
+            ))
+            logs += [log for result in results for log in result]
+    finally:
+        await client.aclose()
+    return logs
+
+
+async def batched(url: str, sellers: list, from_block: int, to_block: int) -> list:
+    transfer_indexer.bsc_rpc_client = BscRpcClient(url, timeout=30, max_concurrency=4)
+    logs = []
+    try:
+        for start in range(from_block, to_block + 1, settings.INDEXER_BLOCK_RANGE):
+            end = min(start + settings.INDEXER_BLOCK_RANGE - 1, to_block)
+            logs += await TransferIndexer.fetch(sellers, start, end)
+    finally:
+        await transfer_indexer.bsc_rpc_client.aclose()
+    return logs
+
+
+async def run(label: str, chain: MockChain, fetch, payments) -> None:
+    chain.requests = chain.calls = 0
+    start = time.perf_counter()
+    logs = await fetch
+    index = defaultdict(deque, {key: deque(queue) for key, queue in payments.items()})
+    matched = TransferIndexer.match(logs, index, chain.head)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<14} {elapsed * 1000:9.1f} ms  logs={len(logs):<6} matched={len(matched):<6} "
+        f"http_requests={chain.requests:<6} rpc_calls={chain.calls}"
+    )
+
+
+async def main(n_blocks: int, n_sellers: int, n_payments: int, latency_ms: float) -> None:
+    chain = MockChain(head=40_000_000, latency=latency_ms / 1000)
+    sellers, payments = build_chain(chain, n_blocks, n_sellers, n_payments)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(chain.app, host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/"
+    from_block = chain.head - n_blocks + 1
+    print(
+        f"{n_blocks} blocks, {n_sellers} sellers, {n_payments} payments, "
+        f"{settings.INDEXER_BLOCK_RANGE} blocks/range, {latency_ms:g} ms mock latency"
+    )
+    await run("per address", chain, per_address(url, sellers, from_block, chain.head), payments)
+    await run("batched", chain, batched(url, sellers, from_block, chain.head), payments)
+
+    server.should_exit = True
+    await serve
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--blocks", type=int, default=10000)
+    parser.add_argument("--sellers", type=int, default=100)
+    parser.add_argument("--payments", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.blocks, args.sellers, args.payments, args.latency_ms))
@@ -0,0 +1,134 @@
+"""
+Product view counting: one UPDATE per view vs. the write-behind ViewCounter.
+
+Creates a throwaway SQLite database with N products and has T threads (the
+threadpool of read_product) register V views each, skewed towards a few hot
+products, two ways:
+
+  per view          UPDATE products SET view_count = view_count + 1, commit
+  buffered          ViewCounter.record(), flushed by ViewCounter.apply() every
+                    --flush-ms in its own thread, plus a final flush
+
+Run from the project root:
+    python -m benchmarks.view_counter [--products 1000] [--threads 8] [--views 2000] [--flush-ms 100]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app import models  # noqa: F401  (registers the tables)
+from app.models.product import Product
+from app.models.user import User
+from app.services.view_counter import ViewCounter
+
+
+def setup(path: str, n_products: int) -> sessionmaker:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(User(id=1, email="bench@example.com", hashed_password="x"))
+    db.add_all([Product(id=i, title=f"p{i}", price=1, seller_id=1) for i in range(1, n_products + 1)])
+    db.commit()
+    db.close()
+    return Session
+
+
+def workload(n_products: int, n_views: int, seed: int) -> list:
+    rng = random.Random(seed)
+    # Zipf-like: a handful of products get most of the views
+    return [min(int(rng.paretovariate(1.2)), n_products) for _ in range(n_views)]
+
+
+def run_threads(n_threads: int, n_views: int, n_products: int, view) -> float:
+    views = [workload(n_products, n_views, seed) for seed in range(n_threads)]
+    threads = [threading.Thread(target=lambda ids=ids: [view(i) for i in ids]) for ids in views]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def per_view(Session, n_threads: int, n_views: int, n_products: int) -> float:
+    def view(product_id: int) -> None:
+        db = Session()
+        try:
+            db.execute(update(Product).where(Product.id == product_id).values(view_count=Product.view_count + 1))
+            db.commit()
+        finally:
+            db.close()
+    return run_threads(n_threads, n_views, n_products, view)
+
+
+def buffered(Session, n_threads: int, n_views: int, n_products: int, flush_interval: float) -> tuple:
+    counter = ViewCounter(flush_interval)
+    done = threading.Event()
+    flushes = []
+
+    def flush() -> None:
+        counts = counter.take()
+        if counts:
+            db = Session()
+            try:
+                ViewCounter.apply(db, counts, datetime.utcnow())
+                db.commit()
+            finally:
+                db.close()
+            flushes.append(len(counts))
+
+    def flusher() -> None:
+        while not done.wait(flush_interval):
+            flush()
+
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    elapsed = run_threads(n_threads, n_views, n_products, counter.record)
+    done.set()
+    thread.join()
+    start = time.perf_counter()
+    flush()
+    return elapsed, time.perf_counter() - start, flushes
+
+
+def total_views(Session) -> int:
+    db = Session()
+    try:
+        return db.scalar(select(func.sum(Product.view_count)))
+    finally:
+        db.close()
+
+
+def main(n_products: int, n_threads: int, n_views: int, flush_ms: float) -> None:
+    print(f"{n_products} products, {n_threads} threads x {n_views} views, flush every {flush_ms:g} ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = setup(os.path.join(tmp, "per_view.db"), n_products)
+        elapsed = per_view(Session, n_threads, n_views, n_products)
+        total = n_threads * n_views
+        print(f"{'per view':<12} {elapsed * 1000:9.1f} ms  {total / elapsed:10.0f} views/s  "
+              f"statements={total:<7} stored={total_views(Session)}")
+
+        Session = setup(os.path.join(tmp, "buffered.db"), n_products)
+        elapsed, final, flushes = buffered(Session, n_threads, n_views, n_products, flush_ms / 1000)
+        print(f"{'buffered':<12} {elapsed * 1000:9.1f} ms  {total / elapsed:10.0f} views/s  "
+              f"flushes={len(flushes):<4} rows/flush={sum(flushes) / max(len(flushes), 1):<7.1f} "
+              f"final flush={final * 1000:.1f} ms  stored={total_views(Session)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--views", type=int, default=2000)
+    parser.add_argument("--flush-ms", type=float, default=100)
+    args = parser.parse_args()
+    main(args.products, args.threads, args.views, args.flush_ms)